@@ -0,0 +1,198 @@
+"""Benchmarks of the AWS session and client helpers.
+
+Run with ``python bench_aws.py``. Nothing here calls AWS: clients are only
+constructed, or calls go to moto or to in-process stand-ins.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+
+def _mean_ms(func: Callable[[], object], n_calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        func()
+    return (time.perf_counter() - start) / n_calls * 1e3
+
+
+def _fake_credentials() -> None:
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+
+def benchmark_personalize_client(n_calls: int = 20) -> None:
+    """``get_personalize_client()`` before and after the session pool.
+
+    Before the pool every call built a new client on the default session.
+    """
+    from botocore.config import Config
+
+    from my_utils.aws.personalize import get_personalize_client
+    from my_utils.aws.session_handler import SESSION_POOL, create_session
+
+    _fake_credentials()
+    SESSION_POOL.clear()
+    before = _mean_ms(
+        lambda: create_session().client("personalize"), n_calls
+    )
+    after = _mean_ms(get_personalize_client, n_calls)
+    configs = _mean_ms(
+        lambda: SESSION_POOL.get_client(
+            "personalize", config=Config(retries={"max_attempts": 5})
+        ),
+        n_calls,
+    )
+    stats = SESSION_POOL.client_stats
+    print(f"new client per call:     {before:7.2f} ms/call")
+    print(f"get_personalize_client:  {after:7.2f} ms/call")
+    print(f"equal Config per call:   {configs:7.2f} ms/call")
+    print(f"pool: {stats.hits} hits, {stats.misses} misses")
+
+
+def benchmark_assume_role_sessions(
+    n_roles: int = 16,
+    sts_latency: float = 0.2,
+    max_workers: int = 8,
+) -> None:
+    """Wall time to assume ``n_roles`` roles, one by one and in parallel.
+
+    STS is moto with ``sts_latency`` seconds added to every AssumeRole.
+    """
+    from moto import mock_aws
+
+    from my_utils.aws.session_handler import (
+        SESSION_POOL,
+        AssumeRoleConfig,
+        create_assume_role_session,
+        create_assume_role_sessions,
+        create_session,
+        create_sts_client,
+    )
+
+    _fake_credentials()
+
+    def configs(session_name: str):
+        return [
+            AssumeRoleConfig(
+                f"arn:aws:iam::{100000000000 + i}:role/reader", session_name
+            )
+            for i in range(n_roles)
+        ]
+
+    with mock_aws():
+        # Pooled sessions built before the mock would reach the real STS
+        SESSION_POOL.clear()
+        try:
+            session = create_session()
+            create_sts_client(session).meta.events.register(
+                "before-call.sts.AssumeRole",
+                lambda **kwargs: time.sleep(sts_latency),
+            )
+            start = time.perf_counter()
+            for config in configs("sequential"):
+                create_assume_role_session(config, session=session)
+            sequential = time.perf_counter() - start
+            start = time.perf_counter()
+            results = create_assume_role_sessions(
+                configs("parallel"), session=session, max_workers=max_workers
+            )
+            parallel = time.perf_counter() - start
+        finally:
+            SESSION_POOL.clear()
+    errors = sum(result.error is not None for result in results)
+    print(f"{n_roles} roles, {sts_latency * 1e3:.0f} ms per AssumeRole")
+    label = f"{max_workers} workers:"
+    print(f"{'sequential:':<20} {sequential:6.2f} s")
+    print(f"{label:<20} {parallel:6.2f} s, {errors} errors")
+
+
+class _SlowS3Handler(BaseHTTPRequestHandler):
+    """Answers every request like a S3 HeadObject, after ``latency``."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.02
+    connections = 0
+
+    def setup(self) -> None:
+        super().setup()
+        _SlowS3Handler.connections += 1
+
+    def do_HEAD(self) -> None:
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.send_header("ETag", '"0"')
+        self.end_headers()
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def benchmark_performance_profiles(
+    n_requests: int = 2_000,
+    workers: int = 32,
+    latency: float = 0.05,
+) -> None:
+    """Requests per second of ``workers`` threads sharing one S3 client.
+
+    The endpoint is a local HTTP server that takes ``latency`` seconds per
+    request. botocore opens a new connection whenever its pool is empty and
+    drops it again if the pool is full, so a pool smaller than ``workers``
+    shows up as new connections (TLS handshakes against AWS).
+    """
+    from botocore.config import Config
+
+    from my_utils.aws.session_handler import SESSION_POOL, get_client
+
+    _fake_credentials()
+    # Discarded connections are what this measures, not worth a warning each
+    logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
+    _SlowS3Handler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowS3Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # get_client has no endpoint option, botocore reads this when a client
+    # is created
+    os.environ["AWS_ENDPOINT_URL_S3"] = (
+        f"http://127.0.0.1:{server.server_address[1]}"
+    )
+    SESSION_POOL.clear()
+    try:
+        for profile in (None, "interactive", "bulk"):
+            client = get_client(
+                "s3",
+                config=Config(s3={"addressing_style": "path"}),
+                performance_profile=profile,
+            )
+
+            def head(i: int) -> None:
+                client.head_object(Bucket="bench", Key=f"key-{i}")
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(head, range(workers)))
+                _SlowS3Handler.connections = 0
+                start = time.perf_counter()
+                list(executor.map(head, range(n_requests)))
+                seconds = time.perf_counter() - start
+            pool_size = client.meta.config.max_pool_connections
+            print(
+                f"{profile or 'default':<12} pool {pool_size:>3}: "
+                f"{n_requests / seconds:7.0f} requests/s, "
+                f"{_SlowS3Handler.connections} new connections"
+            )
+    finally:
+        server.shutdown()
+        del os.environ["AWS_ENDPOINT_URL_S3"]
+        SESSION_POOL.clear()
+
+
+if __name__ == "__main__":
+    benchmark_personalize_client()
+    benchmark_assume_role_sessions()
+    benchmark_performance_profiles()
@@ -0,0 +1,158 @@
+"""Benchmarks of the logging handlers, run with ``python bench_log.py``.
+
+AWS calls go to moto, so they need ``moto`` installed but no account.
+"""
+
+import io
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+
+def _percentiles(log: Callable[[int], None], n_calls: int) -> str:
+    latencies: List[float] = []
+    for i in range(n_calls):
+        start = time.perf_counter()
+        log(i)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1e6
+    p99 = latencies[int(n_calls * 0.99)] * 1e6
+    return f"p50 {p50:6.1f} us, p99 {p99:8.1f} us"
+
+
+def benchmark_s3_handler(
+    n_calls: int = 20_000,
+    upload_latency: float = 0.05,
+) -> None:
+    """Per-call latency of logging to S3, with ``upload_latency`` per PUT.
+
+    The StringIO handler is how records were buffered for S3 before
+    ``S3LogHandler``; it never uploads until exit.
+    """
+    from moto import mock_aws
+
+    import my_utils.aws.s3 as s3
+    from my_utils.log import S3LogHandler
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    write = s3.write
+
+    def slow_write(*args, **kwargs):
+        time.sleep(upload_latency)
+        return write(*args, **kwargs)
+
+    with mock_aws():
+        s3.create_s3_client().create_bucket(Bucket="bench-logs")
+        s3.write = slow_write
+        try:
+            handlers = {
+                "StringIO": logging.StreamHandler(io.StringIO()),
+                "S3LogHandler": S3LogHandler(
+                    "bench-logs", "bench", flush_bytes=64 * 1024
+                ),
+            }
+            for name, handler in handlers.items():
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                bench_logger = logging.getLogger(f"bench.s3.{name}")
+                bench_logger.setLevel(logging.INFO)
+                bench_logger.propagate = False
+                bench_logger.addHandler(handler)
+                result = _percentiles(
+                    lambda i: bench_logger.info("record %d", i), n_calls
+                )
+                handler.close()
+                dropped = getattr(handler, "dropped", 0)
+                parts = getattr(handler, "uploaded_parts", 0)
+                print(
+                    f"{name:<13} {result}, "
+                    f"{parts} parts, {dropped} dropped"
+                )
+        finally:
+            s3.write = write
+
+
+def benchmark_queue(n_calls: int = 50_000) -> None:
+    """Per-call latency of ``Logger`` with and without ``use_queue``.
+
+    Records go to a file and to stdout redirected to a file, the handlers a
+    service usually has.
+    """
+    from my_utils.log import Logger
+
+    modes = {
+        "no queue": {},
+        "queue, drop": {"use_queue": True},
+        "queue, block": {"use_queue": True, "block_on_full_queue": True},
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for index, (name, options) in enumerate(modes.items()):
+            bench_logger = Logger(f"bench.queue.{index}", **options)
+            bench_logger.mylogger.propagate = False
+            path = os.path.join(tmp_dir, f"{index}.log")
+            bench_logger.add_file_handler(path)
+            with open(os.path.join(tmp_dir, "stdout"), "w") as stdout:
+                handler = logging.StreamHandler(stdout)
+                handler.setFormatter(bench_logger.log_formatter)
+                bench_logger.add_handler(handler)
+                result = _percentiles(
+                    lambda i: bench_logger.info("record %d", i), n_calls
+                )
+                bench_logger.stop_queue_listener()
+            print(
+                f"{name:<13} {result}, "
+                f"{bench_logger.dropped_records} dropped"
+            )
+
+
+def benchmark_compressed_file(
+    n_calls: int = 50_000,
+    max_bytes: int = 1024 * 1024,
+) -> None:
+    """Per-call latency and bytes on disk of the rotating file handlers."""
+    from my_utils.log import CompressedRotatingFileHandler, JsonFormatter
+
+    modes = {"plain": "plain", "rotate": None, "gzip": "gzip", "zstd": "zstd"}
+    for name, compression in modes.items():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "app.log")
+            handler: logging.Handler
+            if compression == "plain":
+                handler = logging.FileHandler(path)
+            else:
+                try:
+                    handler = CompressedRotatingFileHandler(
+                        path, max_bytes=max_bytes, compression=compression
+                    )
+                except ImportError:
+                    print(f"{name:<7} skipped, zstandard is not installed")
+                    continue
+            handler.setFormatter(JsonFormatter())
+            bench_logger = logging.getLogger(f"bench.file.{name}")
+            bench_logger.setLevel(logging.INFO)
+            bench_logger.propagate = False
+            bench_logger.addHandler(handler)
+            result = _percentiles(
+                lambda i: bench_logger.info(
+                    "imported", extra={"rows": i, "dataset": "interactions"}
+                ),
+                n_calls,
+            )
+            handler.close()
+            bench_logger.removeHandler(handler)
+            disk_bytes = sum(
+                os.path.getsize(os.path.join(tmp_dir, file_name))
+                for file_name in os.listdir(tmp_dir)
+            )
+            print(f"{name:<7} {result}, {disk_bytes / 1e6:6.2f} MB on disk")
+
+
+if __name__ == "__main__":
+    benchmark_s3_handler()
+    benchmark_queue()
+    benchmark_compressed_file()
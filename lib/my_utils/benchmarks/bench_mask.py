@@ -0,0 +1,171 @@
+"""Benchmarks of the JSON masking helpers.
+
+Run with ``python bench_mask.py``.
+"""
+
+import json
+import os
+import tempfile
+import time
+from hashlib import sha256
+from typing import Optional
+
+from my_utils.mask import (
+    compile_mask_plan,
+    mask_json,
+    mask_jsonl_file_parallel,
+    mask_records,
+)
+
+
+def _mask_json_per_call(obj: dict, mask_json_tag: Optional[str] = None):
+    """The original ``mask_json``, which parses the tag on every call."""
+    if mask_json_tag is None:
+        return f"**MASKED**{sha256(str(obj).encode()).hexdigest()}"
+    paths = [path.strip() for path in mask_json_tag.split(",")]
+    for path in paths:
+        current_object = obj
+        key_list = path.split(".")
+        for key in key_list[:-1]:
+            if key not in current_object:
+                raise ValueError(
+                    f"The key '{key}' does not exist in "
+                    f"'{str(current_object.keys())}'"
+                )
+            current_object = current_object[key]
+        last_key = key_list[-1]
+        if last_key not in current_object:
+            raise ValueError(
+                f"The key '{last_key}' does not exist in "
+                f"'{str(current_object.keys())}'"
+            )
+        current_object[last_key] = (
+            "**MASKED**"
+            + sha256(str(current_object[last_key]).encode()).hexdigest()
+        )
+
+
+def benchmark(
+    n_rows: int = 200_000,
+    mask_json_tag: str = (
+        "user.name, user.contact.email, user.contact.address.street"
+    ),
+) -> None:
+    """Rows/sec of the original per-call masking against a compiled plan."""
+
+    def make_rows():
+        return [
+            {
+                "user": {
+                    "name": i,
+                    "age": 1,
+                    "contact": {
+                        "email": f"user{i % 1000}@example.com",
+                        "address": {"street": i % 50},
+                    },
+                }
+            }
+            for i in range(n_rows)
+        ]
+
+    rows = make_rows()
+    start = time.perf_counter()
+    for row in rows:
+        _mask_json_per_call(row, mask_json_tag)
+    per_call = n_rows / (time.perf_counter() - start)
+
+    rows = make_rows()
+    start = time.perf_counter()
+    for _ in mask_records(rows, compile_mask_plan(mask_json_tag)):
+        pass
+    compiled = n_rows / (time.perf_counter() - start)
+
+    print(f"per-call parse: {per_call:,.0f} rows/s")
+    print(
+        f"compiled plan:  {compiled:,.0f} rows/s "
+        f"({compiled / per_call:.2f}x)"
+    )
+
+
+def benchmark_parallel(
+    n_rows: int = 1_000_000,
+    mask_json_tag: str = "user.name, user.contact.email",
+) -> None:
+    """Throughput of parallel file masking from 1 to N worker processes."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, "input.jsonl")
+        output_path = os.path.join(tmp_dir, "output.jsonl")
+        with open(input_path, "w") as f:
+            for i in range(n_rows):
+                row = {
+                    "user": {
+                        "name": i,
+                        "contact": {"email": f"user{i}@example.com"},
+                    }
+                }
+                f.write(json.dumps(row) + "\n")
+
+        workers = 1
+        while workers <= (os.cpu_count() or 1):
+            start = time.perf_counter()
+            mask_jsonl_file_parallel(
+                input_path,
+                output_path,
+                mask_json_tag,
+                workers=workers,
+                chunk_size=4 * 1024 * 1024,
+            )
+            rate = n_rows / (time.perf_counter() - start)
+            print(f"{workers:>3} workers: {rate:,.0f} rows/s")
+            workers *= 2
+
+
+def benchmark_wildcards(
+    n_rows: int = 20_000, depth: int = 8, width: int = 50
+) -> None:
+    """Whole-document hashing against wildcard paths on nested and wide
+    documents."""
+
+    def make_nested():
+        doc = {"email": "john.doe@example.com", "name": "john"}
+        for _ in range(depth):
+            doc = {"child": doc, "items": [{"id": i} for i in range(3)]}
+        return doc
+
+    def make_wide():
+        return {
+            "user": {
+                "contacts": [
+                    {"email": f"user{i}@example.com", "phone": i}
+                    for i in range(width)
+                ]
+            }
+        }
+
+    cases = [
+        ("nested", make_nested, ".".join(["child"] * depth) + ".email"),
+        ("nested *", make_nested, ".".join(["*"] * depth) + ".email?"),
+        ("wide [*]", make_wide, "user.contacts[*].email"),
+    ]
+    for name, make_doc, mask_json_tag in cases:
+        rows = [make_doc() for _ in range(n_rows)]
+        start = time.perf_counter()
+        for row in rows:
+            mask_json(row)
+        whole = n_rows / (time.perf_counter() - start)
+
+        rows = [make_doc() for _ in range(n_rows)]
+        start = time.perf_counter()
+        for _ in mask_records(rows, mask_json_tag):
+            pass
+        paths = n_rows / (time.perf_counter() - start)
+        print(
+            f"{name:<9} whole document: {whole:,.0f} rows/s, "
+            f"paths: {paths:,.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark_wildcards()
+    benchmark_parallel()
@@ -0,0 +1,516 @@
+"""Benchmarks of the Personalize helpers against in-process stand-ins.
+
+Run with ``python bench_personalize.py``.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from array import array
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import botocore.session
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+from botocore.model import OperationModel
+
+from my_utils.aws import personalize as personalize_module
+from my_utils.aws import personalize_provisioner
+from my_utils.aws.personalize import (
+    RESOURCE_PAGINATORS,
+    PersonalizeResources,
+    ResourceArnIndex,
+    ResourceMonitor,
+    create_import_job,
+    create_import_jobs,
+    wait_for_resource,
+)
+from my_utils.aws.personalize_incremental import (
+    RowHashManifest,
+    compute_file_delta,
+    compute_import_delta,
+    row_hash,
+)
+from my_utils.aws.personalize_validation import (
+    validate_import_file,
+    validate_import_lines,
+)
+from my_utils.aws.session_handler import SESSION_POOL, create_session
+from my_utils.log import logger
+
+PAGE_SIZE = 100
+
+
+class _Paginator:
+    def __init__(self, client: "FakePersonalize", resource_type: str):
+        self.client = client
+        self.resource_type = resource_type
+
+    def paginate(self, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        info = RESOURCE_PAGINATORS[self.resource_type]
+        resources = self.client.resources[self.resource_type]
+        for start in range(0, max(len(resources), 1), PAGE_SIZE):
+            self.client.list_calls += 1
+            page = resources[start : start + PAGE_SIZE]
+            yield {info["response_info_key"]: page}
+
+
+class FakeClock:
+    """Simulated time that only moves when ``sleep`` is called."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakePersonalize:
+    """Answers the list APIs from in-memory resources, counting pages.
+
+    Import jobs become active ``job_seconds[dataset name]`` seconds of
+    ``clock`` time after they are created.
+    """
+
+    exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def __init__(
+        self,
+        clock: Optional[FakeClock] = None,
+        job_seconds: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.resources: Dict[str, List[Dict[str, str]]] = {}
+        self.list_calls = 0
+        self.describe_calls = 0
+        self.clock = clock or FakeClock()
+        self.job_seconds = job_seconds or {}
+        self._jobs: Dict[str, float] = {}
+
+    def create_dataset_import_job(
+        self, jobName: str, datasetArn: str, **kwargs: Any
+    ) -> Dict[str, str]:
+        arn = f"arn:aws:personalize:::dataset-import-job/{jobName}"
+        dataset_name = datasetArn.split("/")[-1]
+        self._jobs[arn] = self.clock() + self.job_seconds[dataset_name]
+        return {"datasetImportJobArn": arn}
+
+    def describe_dataset_import_job(
+        self, datasetImportJobArn: str
+    ) -> Dict[str, Any]:
+        self.describe_calls += 1
+        done = self.clock() >= self._jobs[datasetImportJobArn]
+        status = "ACTIVE" if done else "CREATE IN_PROGRESS"
+        return {"datasetImportJob": {"status": status}}
+
+    def add_resources(
+        self, resource_type: PersonalizeResources, names: List[str]
+    ) -> None:
+        arn_key = RESOURCE_PAGINATORS[resource_type]["arn_key"]
+        self.resources.setdefault(resource_type, []).extend(
+            {
+                "name": name,
+                arn_key: f"arn:aws:personalize:::{resource_type}/{name}",
+            }
+            for name in names
+        )
+
+    def get_paginator(self, name: str) -> _Paginator:
+        for resource_type, info in RESOURCE_PAGINATORS.items():
+            if info["paginator"] == name:
+                return _Paginator(self, resource_type)
+        raise ValueError(name)
+
+
+def _linear_arn(
+    resource_name: str,
+    resource_type: PersonalizeResources,
+    personalize: FakePersonalize,
+    **paginate_arg: Optional[str],
+) -> str:
+    # get_exsiting_resouce_arn before the index: a sweep per lookup that
+    # stops at the first match
+    paginator_info = RESOURCE_PAGINATORS[resource_type]
+    paginator = personalize.get_paginator(paginator_info["paginator"])
+    for resource_group in paginator.paginate(**paginate_arg):
+        for resource in resource_group[paginator_info["response_info_key"]]:
+            if resource["name"] == resource_name:
+                return resource[paginator_info["arn_key"]]
+    return ""
+
+
+def benchmark_resource_arn_index(
+    n_flows: int = 20,
+    n_existing: int = 1_000,
+) -> None:
+    """List API calls of flows that resolve existing resources by name.
+
+    Every flow resolves its dataset group, three schemas and five filters
+    among ``n_existing`` resources of each type, as ``prepare_solution``
+    runs do when the resources already exist.
+    """
+    personalize = FakePersonalize()
+    for resource_type in ("dataset-group", "schema", "filter"):
+        personalize.add_resources(
+            resource_type, [f"{resource_type}-{i}" for i in range(n_existing)]
+        )
+    lookups = []
+    for flow in range(n_flows):
+        lookups.append(("dataset-group", f"dataset-group-{flow * 37}"))
+        lookups += [("schema", f"schema-{flow * 41 + i}") for i in range(3)]
+        lookups += [("filter", f"filter-{flow * 43 + i}") for i in range(5)]
+
+    start = time.perf_counter()
+    for resource_type, name in lookups:
+        assert _linear_arn(name, resource_type, personalize)
+    before_seconds = time.perf_counter() - start
+    before_calls = personalize.list_calls
+
+    index = ResourceArnIndex()
+    start = time.perf_counter()
+    for resource_type, name in lookups:
+        assert index.get_arn(personalize, resource_type, name)
+    after_seconds = time.perf_counter() - start
+
+    print(f"{len(lookups)} lookups among {n_existing} resources per type")
+    print(
+        f"sweep per lookup: {before_calls:5d} list calls, "
+        f"{before_seconds * 1e3:6.1f} ms"
+    )
+    print(
+        f"ResourceArnIndex: {index.api_calls:5d} list calls, "
+        f"{after_seconds * 1e3:6.1f} ms, {index.hits} hits"
+    )
+
+
+def benchmark_parallel_imports(
+    job_minutes: Optional[Dict[str, float]] = None,
+) -> None:
+    """Simulated wall time of importing three datasets.
+
+    Serially every import is submitted and waited on before the next, as
+    ``create_import_job(wait=True)`` does; ``create_import_jobs`` submits
+    all of them and waits on one ResourceMonitor.
+    """
+    job_minutes = job_minutes or {
+        "INTERACTIONS": 40,
+        "ITEMS": 12,
+        "USERS": 8,
+    }
+    job_seconds = {name: m * 60 for name, m in job_minutes.items()}
+    imports = {
+        f"arn:aws:personalize:::dataset/shop/{name}": f"s3://data/{name}.csv"
+        for name in job_seconds
+    }
+
+    clock = FakeClock()
+    personalize = FakePersonalize(clock, job_seconds)
+    for dataset_arn, data_path in imports.items():
+        job_arn = create_import_job(
+            data_path,
+            dataset_arn,
+            "FULL",
+            "role",
+            wait=False,
+            personalize=personalize,
+        )
+        wait_for_resource(
+            job_arn,
+            "dataset-import-job",
+            personalize=personalize,
+            clock=clock,
+            sleep=clock.sleep,
+        )
+    serial = clock.now
+    serial_calls = personalize.describe_calls
+
+    clock = FakeClock()
+    personalize = FakePersonalize(clock, job_seconds)
+    monitor = ResourceMonitor(personalize, clock=clock, sleep=clock.sleep)
+    start = time.perf_counter()
+    results = create_import_jobs(imports, "FULL", "role", monitor=monitor)
+    cpu_ms = (time.perf_counter() - start) * 1e3
+    succeeded = sum(result.succeeded for result in results.values())
+
+    minutes = ", ".join(f"{m} min" for m in job_minutes.values())
+    print(f"import jobs of {minutes}")
+    print(
+        f"serial:             {serial / 60:5.1f} min, "
+        f"{serial_calls} describe calls"
+    )
+    print(
+        f"create_import_jobs: {clock.now / 60:5.1f} min, "
+        f"{personalize.describe_calls} describe calls, "
+        f"{succeeded}/{len(results)} succeeded, {cpu_ms:.1f} ms real time"
+    )
+
+
+def _answer_personalize_call(
+    model: OperationModel, params: Dict[str, Any], **kwargs: Any
+) -> Tuple[AWSResponse, Dict[str, Any]]:
+    # Creates return an ARN named after the resource, describes report
+    # ACTIVE and lists return one empty page
+    output = model.output_shape
+    if model.name.startswith("Describe"):
+        (key,) = output.members
+        parsed: Dict[str, Any] = {key: {"status": "ACTIVE"}}
+    else:
+        name = params.get("name") or params.get("jobName") or "resource"
+        parsed = {
+            member: []
+            if shape.type_name == "list"
+            else f"arn:aws:personalize:us-east-1:123456789012:"
+            f"{member[: -len('Arn')]}/{name}"
+            for member, shape in output.members.items()
+            if shape.type_name == "list" or member.endswith("Arn")
+        }
+    return AWSResponse("", 200, {}, None), parsed
+
+
+def benchmark_provisioning_clients(n_runs: int = 50) -> None:
+    """Client constructions and wall time of ``provision`` runs.
+
+    Every botocore client construction is counted and its Personalize
+    calls answered in process, so the wall time is this package's own
+    overhead. The spec has three datasets, an import, a filter and a
+    solution.
+    """
+    from moto import mock_aws
+
+    from my_utils.aws import s3
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    constructions: Counter = Counter()
+    api_calls: Counter = Counter()
+    create_client = botocore.session.Session.create_client
+
+    def counted_create_client(
+        self: botocore.session.Session, service_name: str, *args, **kwargs
+    ) -> Any:
+        client = create_client(self, service_name, *args, **kwargs)
+        constructions[service_name] += 1
+        # Counted before the stub answers and ends the call
+        client.meta.events.register(
+            "before-call.personalize", lambda **kwargs: api_calls.update([1])
+        )
+        client.meta.events.register(
+            "before-call.personalize", _answer_personalize_call
+        )
+        return client
+
+    resolutions: Counter = Counter()
+    get_personalize_client = personalize_module.get_personalize_client
+
+    def resolved_client(*args: Any, **kwargs: Any) -> Any:
+        resolutions[1] += 1
+        return get_personalize_client(*args, **kwargs)
+
+    def unpooled_client(*args: Any, **kwargs: Any) -> Any:
+        # get_personalize_client before the session pool
+        resolutions[1] += 1
+        return create_session().client("personalize")
+
+    with mock_aws(), tempfile.TemporaryDirectory() as directory:
+        # The import step validates its data against the schema first
+        s3_client = s3.create_s3_client()
+        s3_client.create_bucket(Bucket="data")
+        s3_client.put_object(
+            Bucket="data",
+            Key="interactions.csv",
+            Body=INTERACTIONS_HEADER
+            + b"".join(map(_interaction_row, range(100))),
+        )
+        schema_path = os.path.join(directory, "schema.json")
+        with open(schema_path, "w") as f:
+            json.dump(INTERACTIONS_SCHEMA, f)
+        spec = {
+            "dataset_group": "shop",
+            "role_arn": "arn:aws:iam::123456789012:role/personalize",
+            "datasets": {
+                "Interactions": {
+                    "schema_path": schema_path,
+                    "data_path": "s3://data/interactions.csv",
+                },
+                "Items": {"schema_path": schema_path},
+                "Users": {"schema_path": schema_path},
+            },
+            "filters": {"unseen": "EXCLUDE ItemID WHERE Interactions"},
+            "solutions": {"shop-sims": {"recipe_arn": "arn:recipe"}},
+        }
+        botocore.session.Session.create_client = counted_create_client
+        try:
+            for label, get_client, shared in (
+                ("new client per call", unpooled_client, False),
+                ("pooled client", resolved_client, False),
+                ("shared client", resolved_client, True),
+            ):
+                SESSION_POOL.clear()
+                constructions.clear()
+                api_calls.clear()
+                resolutions.clear()
+                for module in (personalize_module, personalize_provisioner):
+                    module.get_personalize_client = get_client
+                client = get_client() if shared else None
+                start = time.perf_counter()
+                for _ in range(n_runs):
+                    report = personalize_provisioner.provision(
+                        spec, client, s3_client=s3_client
+                    )
+                    assert report.succeeded, report.results
+                seconds = time.perf_counter() - start
+                print(
+                    f"{label:20s} {constructions['personalize']:3d} clients, "
+                    f"{sum(resolutions.values()):3d} get_personalize_client, "
+                    f"{sum(api_calls.values()) / n_runs:4.0f} calls/run, "
+                    f"{seconds / n_runs * 1e3:6.2f} ms/run"
+                )
+        finally:
+            botocore.session.Session.create_client = create_client
+            for module in (personalize_module, personalize_provisioner):
+                module.get_personalize_client = get_personalize_client
+
+
+INTERACTIONS_HEADER = b"USER_ID,ITEM_ID,TIMESTAMP,EVENT_TYPE,SESSION,PAD\n"
+INTERACTIONS_SCHEMA = {
+    "type": "record",
+    "name": "Interactions",
+    "namespace": "com.amazonaws.personalize.schema",
+    "fields": [
+        {"name": "USER_ID", "type": "string"},
+        {"name": "ITEM_ID", "type": "string"},
+        {"name": "TIMESTAMP", "type": "long"},
+        {"name": "EVENT_TYPE", "type": "string"},
+        {"name": "SESSION", "type": "string"},
+        {"name": "PAD", "type": ["null", "string"]},
+    ],
+    "version": "1.0",
+}
+
+
+def _interaction_row(i: int) -> bytes:
+    return (
+        f"user{i * 7919 % 1000003},item{i % 50021},{1600000000 + i},"
+        f"click,session-{i // 20:012d},{'x' * (i % 40)}\n"
+    ).encode()
+
+
+def _write_interactions(path: str, gigabytes: float) -> int:
+    """Write an interactions CSV of about ``gigabytes``, returning rows."""
+    rows = 0
+    with open(path, "wb") as f:
+        f.write(INTERACTIONS_HEADER)
+        while f.tell() < gigabytes * 1e9:
+            chunk = range(rows, rows + 1000)
+            f.write(b"".join(map(_interaction_row, chunk)))
+            rows += 1000
+    return rows
+
+
+def benchmark_file_delta(
+    gigabytes: float = 2.0,
+    new_fraction: float = 0.05,
+    workers: Optional[int] = None,
+) -> None:
+    """Delta passes over a CSV whose rows are mostly in the manifest.
+
+    The last ``new_fraction`` of the rows are new. The streaming pass is
+    the one-worker path of ``create_incremental_import_job``, the file
+    pass runs ``compute_file_delta`` on ``workers`` processes.
+    """
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "interactions.csv")
+        rows = _write_interactions(input_path, gigabytes)
+        size = os.path.getsize(input_path)
+        old_rows = int(rows * (1 - new_fraction))
+        manifest = RowHashManifest(
+            array(
+                "Q",
+                sorted(row_hash(_interaction_row(i)) for i in range(old_rows)),
+            )
+        )
+        print(
+            f"{size / 1e9:.2f} GB, {rows} rows, {len(manifest)} in the "
+            f"manifest"
+        )
+
+        output_path = os.path.join(directory, "delta.csv")
+        start = time.perf_counter()
+        with open(input_path, "rb") as lines, open(output_path, "wb") as out:
+            delta = compute_import_delta(lines, manifest, out)
+        seconds = time.perf_counter() - start
+        print(
+            f"compute_import_delta: {size / 1e6 / seconds:6.1f} MB/s, "
+            f"{delta.new_rows} new rows in {seconds:.0f} s"
+        )
+        start = time.perf_counter()
+        file_delta = compute_file_delta(
+            input_path, output_path, manifest, workers=workers
+        )
+        seconds = time.perf_counter() - start
+        assert file_delta == delta
+        print(
+            f"compute_file_delta:   {size / 1e6 / seconds:6.1f} MB/s on "
+            f"{workers} workers"
+        )
+    start = time.perf_counter()
+    assert len(manifest.union(delta.new_hashes)) == old_rows + delta.new_rows
+    print(f"manifest union: {time.perf_counter() - start:.1f} s")
+
+    # What the new hashes took as a set, as they were kept before
+    tracemalloc.start()
+    hash_set = set(delta.new_hashes)
+    set_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del hash_set
+    array_bytes = delta.new_hashes.itemsize * len(delta.new_hashes)
+    print(
+        f"new hashes: {array_bytes / 1e6:.1f} MB as array('Q'), "
+        f"{set_bytes / 1e6:.1f} MB as a set"
+    )
+
+
+def benchmark_validation(
+    gigabytes: float = 0.5,
+    workers: Optional[int] = None,
+) -> None:
+    """Validation throughput on a valid interactions CSV.
+
+    Every row is checked, since a valid file never reaches ``max_errors``.
+    """
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "interactions.csv")
+        rows = _write_interactions(input_path, gigabytes)
+        print(f"{os.path.getsize(input_path) / 1e9:.2f} GB, {rows} rows")
+        with open(input_path, "rb") as lines:
+            report = validate_import_lines(lines, INTERACTIONS_SCHEMA)
+        assert report.ok and report.rows == rows, report.summary()
+        print(f"validate_import_lines: {report.mb_per_second:6.1f} MB/s")
+        report = validate_import_file(
+            input_path, INTERACTIONS_SCHEMA, workers=workers
+        )
+        assert report.ok and report.rows == rows, report.summary()
+        print(
+            f"validate_import_file:  {report.mb_per_second:6.1f} MB/s on "
+            f"{workers} workers"
+        )
+
+
+if __name__ == "__main__":
+    # Keep the per-resource progress logs out of the results
+    logger.mylogger.setLevel(logging.WARNING)
+    benchmark_resource_arn_index()
+    benchmark_parallel_imports()
+    benchmark_provisioning_clients()
+    benchmark_file_delta()
+    benchmark_validation()
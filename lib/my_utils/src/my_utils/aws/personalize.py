@@ -1,8 +1,32 @@
+import asyncio
+import math
+import random
+import tempfile
+import threading
 import time
+import weakref
+from dataclasses import dataclass
 from functools import partial
-from typing import Callable, Dict, List, Literal, Optional, Sequence, TypedDict, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
+
+from botocore.exceptions import BotoCoreError
 
-from my_utils.aws.session_handler import create_session
+from my_utils.aws import s3
+from my_utils.aws.personalize_validation import validate_s3_import_file
+from my_utils.aws.session_handler import PerformanceProfile, get_client
 from my_utils.log import logger
 from mypy_boto3_personalize.client import PersonalizeClient
 from mypy_boto3_personalize.literals import (
@@ -13,6 +37,9 @@ from mypy_boto3_personalize.literals import (
 from mypy_boto3_personalize.type_defs import SolutionConfigTypeDef, TagTypeDef
 from prefect import task
 
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
 AWSPersonalizeDatasetType = Literal["Interactions", "Items", "Users"]
 PersonalizeResources = Literal[
     "schema",
@@ -26,9 +53,10 @@ PersonalizeResources = Literal[
 ]
 
 
-class ResoureDesciption(TypedDict):
-    func: Callable
-    arg: Dict
+class ResourceDescriber(TypedDict):
+    method: str
+    arn_arg: str
+    response_key: str
 
 
 class ResourePaginatorInfo(TypedDict):
@@ -71,10 +99,195 @@ RESOURCE_PAGINATORS: Dict[PersonalizeResources, ResourePaginatorInfo] = {
 }
 
 
-def get_personalize_client() -> PersonalizeClient:
-    session = create_session()
-    client = session.client("personalize")
-    return client
+RESOURCE_DESCRIBERS: Dict[PersonalizeResources, ResourceDescriber] = {
+    "dataset-group": {
+        "method": "describe_dataset_group",
+        "arn_arg": "datasetGroupArn",
+        "response_key": "datasetGroup",
+    },
+    "dataset": {
+        "method": "describe_dataset",
+        "arn_arg": "datasetArn",
+        "response_key": "dataset",
+    },
+    "dataset-import-job": {
+        "method": "describe_dataset_import_job",
+        "arn_arg": "datasetImportJobArn",
+        "response_key": "datasetImportJob",
+    },
+    "solution-version": {
+        "method": "describe_solution_version",
+        "arn_arg": "solutionVersionArn",
+        "response_key": "solutionVersion",
+    },
+    "batch-inference-job": {
+        "method": "describe_batch_inference_job",
+        "arn_arg": "batchInferenceJobArn",
+        "response_key": "batchInferenceJob",
+    },
+    "filter": {
+        "method": "describe_filter",
+        "arn_arg": "filterArn",
+        "response_key": "filter",
+    },
+    "solution": {
+        "method": "describe_solution",
+        "arn_arg": "solutionArn",
+        "response_key": "solution",
+    },
+}
+
+# Seconds to wait for a resource to become active before giving up
+DEFAULT_WAIT_TIMEOUTS: Dict[PersonalizeResources, float] = {
+    "dataset-group": 15 * 60,
+    "dataset": 15 * 60,
+    "solution": 15 * 60,
+    "filter": 30 * 60,
+    "dataset-import-job": 6 * 60 * 60,
+    "solution-version": 24 * 60 * 60,
+    "batch-inference-job": 24 * 60 * 60,
+}
+
+ACTIVE_STATUS = "ACTIVE"
+# Status reported by ResourceMonitor when a describe call raised
+DESCRIBE_FAILED_STATUS = "DESCRIBE FAILED"
+
+
+@dataclass
+class ResourceStatus:
+    """Last seen status of a Personalize resource."""
+
+    resource_arn: str
+    resource_type: PersonalizeResources
+    status: str
+    failure_reason: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status == ACTIVE_STATUS
+
+    @property
+    def failed(self) -> bool:
+        # CREATE FAILED, UPDATE FAILED, CREATE STOPPED, DELETE PENDING, ...
+        return (
+            self.status.endswith(("FAILED", "STOPPED", "STOPPING"))
+            or self.status.startswith("DELETE")
+        )
+
+    @property
+    def done(self) -> bool:
+        return self.active or self.failed
+
+
+def get_personalize_client(
+    performance_profile: Optional[PerformanceProfile] = None,
+) -> PersonalizeClient:
+    return get_client("personalize", performance_profile=performance_profile)
+
+
+ResourceIndexKey = Tuple[PersonalizeResources, Tuple[Tuple[str, str], ...]]
+
+
+class ResourceArnIndex:
+    """Per-client index of resource names to ARNs.
+
+    Each (resource type, parent ARN) index is filled by one paginated sweep
+    of the list API and served from memory for ``ttl`` seconds. A name that
+    is not in the index triggers one fresh sweep before giving up. ARNs of
+    resources created through this module are added as they are created.
+    ``api_calls`` counts the list pages fetched.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self._indexes: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index_key(
+        resource_type: PersonalizeResources,
+        paginate_arg: Dict[str, Optional[str]],
+    ) -> ResourceIndexKey:
+        return (resource_type, tuple(sorted(paginate_arg.items())))
+
+    def _sweep(
+        self,
+        personalize: PersonalizeClient,
+        resource_type: PersonalizeResources,
+        paginate_arg: Dict[str, Optional[str]],
+    ) -> Dict[str, str]:
+        paginator_info = RESOURCE_PAGINATORS[resource_type]
+        paginator = personalize.get_paginator(paginator_info["paginator"])
+        name_to_arn = {}
+        response_info_key = paginator_info["response_info_key"]
+        for resource_group in paginator.paginate(**paginate_arg):
+            with self._lock:
+                self.api_calls += 1
+            for resource in resource_group[response_info_key]:
+                resource_arn = resource[paginator_info["arn_key"]]
+                if resource_type == "solution-version":
+                    resource_name_ref = resource_arn.split("/")[-1]
+                else:
+                    resource_name_ref = resource["name"]
+                name_to_arn[resource_name_ref] = resource_arn
+        with self._lock:
+            indexes = self._indexes.setdefault(personalize, {})
+            indexes[self._index_key(resource_type, paginate_arg)] = (
+                time.monotonic() + self.ttl,
+                name_to_arn,
+            )
+        return name_to_arn
+
+    def get_arn(
+        self,
+        personalize: PersonalizeClient,
+        resource_type: PersonalizeResources,
+        resource_name: str,
+        **paginate_arg: Optional[str],
+    ) -> str:
+        """ARN of a named resource, or an empty string if it does not exist."""
+        key = self._index_key(resource_type, paginate_arg)
+        with self._lock:
+            expires, name_to_arn = self._indexes.get(personalize, {}).get(
+                key, (0.0, {})
+            )
+            if expires > time.monotonic() and resource_name in name_to_arn:
+                self.hits += 1
+                return name_to_arn[resource_name]
+            self.misses += 1
+        name_to_arn = self._sweep(personalize, resource_type, paginate_arg)
+        return name_to_arn.get(resource_name, "")
+
+    def add(
+        self,
+        personalize: PersonalizeClient,
+        resource_type: PersonalizeResources,
+        resource_name: str,
+        resource_arn: str,
+        **paginate_arg: Optional[str],
+    ) -> None:
+        """Record a newly created resource in an existing index."""
+        key = self._index_key(resource_type, paginate_arg)
+        with self._lock:
+            index = self._indexes.get(personalize, {}).get(key)
+            if index is not None:
+                index[1][resource_name] = resource_arn
+
+    def invalidate(
+        self,
+        personalize: Optional[PersonalizeClient] = None,
+    ) -> None:
+        with self._lock:
+            if personalize is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(personalize, None)
+
+
+RESOURCE_ARN_INDEX = ResourceArnIndex()
 
 
 def get_exsiting_resouce_arn(
@@ -83,25 +296,9 @@ def get_exsiting_resouce_arn(
     personalize: PersonalizeClient,
     **paginate_arg: Optional[str],
 ) -> str:
-    paginator_info = RESOURCE_PAGINATORS[resource_type]
-    paginator = personalize.get_paginator(paginator_info["paginator"])
-    resource_arn = ""
-    found_resource = False
-    for resource_group in paginator.paginate(**paginate_arg):
-        for resource in resource_group[paginator_info["response_info_key"]]:
-            if resource_type == "solution-version":
-                resource_name_ref = resource[paginator_info["arn_key"]].split(
-                    "/"
-                )[-1]
-            else:
-                resource_name_ref = resource["name"]
-            if resource_name_ref == resource_name:
-                resource_arn = resource[paginator_info["arn_key"]]
-                found_resource = True
-                break
-        if found_resource == True:
-            break
-    return resource_arn
+    return RESOURCE_ARN_INDEX.get_arn(
+        personalize, resource_type, resource_name, **paginate_arg
+    )
 
 
 @task(
@@ -118,6 +315,9 @@ def get_dataset_group(
         dataset_group_arn = response["datasetGroupArn"]
         if tags is not None:
             personalize.tag_resource(resourceArn=dataset_group_arn, tags=tags)
+        RESOURCE_ARN_INDEX.add(
+            personalize, "dataset-group", dataset_group_name, dataset_group_arn
+        )
         logger.info(f"New Dataset Group: {dataset_group_arn}")
     except personalize.exceptions.ResourceAlreadyExistsException:
         dataset_group_arn = get_exsiting_resouce_arn(
@@ -134,13 +334,14 @@ def prepare_schema(
     personalize: PersonalizeClient,
     schema_path: Optional[str] = None,
 ) -> str:
-    with open(schema_path) as f:
-        schema = f.read()
     if schema_path is not None:
+        with open(schema_path) as f:
+            schema = f.read()
         schema_arn = personalize.create_schema(
             name=schema_name,
             schema=schema,
         )["schemaArn"]
+        RESOURCE_ARN_INDEX.add(personalize, "schema", schema_name, schema_arn)
         logger.info(f"New Schema: {schema_arn}")
     else:
         schema_arn = get_exsiting_resouce_arn(
@@ -157,17 +358,24 @@ def get_dataset(
     dataset_type: AWSPersonalizeDatasetType,
     schema_path: Optional[str] = None,
     tags: Optional[Sequence[TagTypeDef]] = None,
+    schema_arn: Optional[str] = None,
+    personalize: Optional[PersonalizeClient] = None,
 ) -> str:
+    """Create a dataset from ``schema_path`` or an existing ``schema_arn``.
+
+    Without either, the ARN of the existing dataset is looked up instead.
+    """
     dataset_group_name = dataset_group_arn.split("/")[-1]
     dataset_name = f"{dataset_group_name}_{dataset_type}"
-    personalize = get_personalize_client()
+    personalize = personalize or get_personalize_client()
 
-    if schema_path is not None:
-        schema_arn = prepare_schema(
-            schema_name=dataset_name,
-            personalize=personalize,
-            schema_path=schema_path,
-        )
+    if schema_path is not None or schema_arn is not None:
+        if schema_arn is None:
+            schema_arn = prepare_schema(
+                schema_name=dataset_name,
+                personalize=personalize,
+                schema_path=schema_path,
+            )
         response = personalize.create_dataset(
             name=dataset_name,
             schemaArn=schema_arn,
@@ -177,6 +385,13 @@ def get_dataset(
         dataset_arn = response["datasetArn"]
         if tags is not None:
             personalize.tag_resource(resourceArn=dataset_arn, tags=tags)
+        RESOURCE_ARN_INDEX.add(
+            personalize,
+            "dataset",
+            dataset_name,
+            dataset_arn,
+            datasetGroupArn=dataset_group_arn,
+        )
         logger.info(f"New Dataset: {dataset_arn}")
     else:
         dataset_arn = get_exsiting_resouce_arn(
@@ -200,35 +415,72 @@ def prepare_solution_version(
     training_mode: Optional[TrainingModeType] = None,
     recipe_arn: Optional[str] = None,
     tags: Optional[Sequence[TagTypeDef]] = None,
+    personalize: Optional[PersonalizeClient] = None,
 ) -> str:
+    personalize = personalize or get_personalize_client()
     solution_arn = get_solution(
         solution_name=solution_name,
         dataset_group_arn=dataset_group_arn,
         recipe_arn=recipe_arn,
         tags=tags,
+        personalize=personalize,
     )
     if recipe_arn is not None:
-        check_active(resource_arn=solution_arn, resource_type="solution")
+        check_active(
+            resource_arn=solution_arn,
+            resource_type="solution",
+            personalize=personalize,
+        )
     solution_version_arn = get_solution_version(
         solution_version_name=solution_version_name,
         solution_arn=solution_arn,
         training_mode=training_mode,
         tags=tags,
+        personalize=personalize,
     )
     return solution_version_arn
 
 
+def get_import_job_name(dataset_arn: str, data_path: str) -> str:
+    dataset_name = "_".join(dataset_arn.split("/")[-2:])
+    file_name = data_path.split("/")[-1]
+    return f"{dataset_name}_{file_name}"
+
+
 def create_import_job(
     data_path: str,
     dataset_arn: str,
     import_mode: ImportModeType,
     role_arn: str,
-) -> None:
-    personalize = get_personalize_client()
-    dataset_name = "_".join(dataset_arn.split("/")[-2:])
-    file_name = data_path.split("/")[-1]
+    wait: bool = True,
+    personalize: Optional[PersonalizeClient] = None,
+    schema_path: Optional[str] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """Submit a dataset import job and return its ARN.
+
+    With ``wait=False`` the job is only submitted; wait on the ARN with
+    ``wait_for_resource`` or a ``ResourceMonitor``. With ``schema_path``
+    the data is first streamed through ``validate_s3_import_file`` and a
+    ValueError is raised, before any job is submitted, if it does not match
+    the schema.
+    """
+    personalize = personalize or get_personalize_client()
+    if schema_path is not None:
+        report = validate_s3_import_file(
+            data_path, schema_path, s3_client=s3_client
+        )
+        if not report.ok:
+            raise ValueError(
+                f"{data_path} does not match {schema_path}:\n"
+                + report.summary()
+            )
+        logger.info(
+            f"{data_path} Validated: {report.rows} rows, "
+            f"{report.mb_per_second:.1f} MB/s"
+        )
     response = personalize.create_dataset_import_job(
-        jobName=f"{dataset_name}_{file_name}",
+        jobName=get_import_job_name(dataset_arn, data_path),
         datasetArn=dataset_arn,
         dataSource={"dataLocation": data_path},
         roleArn=role_arn,
@@ -238,68 +490,404 @@ def create_import_job(
         f"{dataset_arn} Import Job Creation Starts, Import Mode: {import_mode}"
     )
     import_job_arn = response["datasetImportJobArn"]
-    check_active(import_job_arn, resource_type="dataset-import-job")
+    if wait:
+        check_active(
+            import_job_arn,
+            resource_type="dataset-import-job",
+            personalize=personalize,
+        )
+    return import_job_arn
+
+
+def describe_resource(
+    resource_arn: str,
+    resource_type: PersonalizeResources,
+    personalize: Optional[PersonalizeClient] = None,
+) -> Dict[str, Any]:
+    """Describe a resource with the describe call of its type."""
+    personalize = personalize or get_personalize_client()
+    describer = RESOURCE_DESCRIBERS[resource_type]
+    response = getattr(personalize, describer["method"])(
+        **{describer["arn_arg"]: resource_arn}
+    )
+    return response[describer["response_key"]]
+
+
+def get_resource_status(
+    resource_arn: str,
+    resource_type: PersonalizeResources,
+    personalize: Optional[PersonalizeClient] = None,
+) -> ResourceStatus:
+    description = describe_resource(resource_arn, resource_type, personalize)
+    return ResourceStatus(
+        resource_arn=resource_arn,
+        resource_type=resource_type,
+        status=description.get("status", ""),
+        failure_reason=description.get("failureReason"),
+    )
+
+
+def _poll_delays(
+    initial_interval: float,
+    max_interval: float,
+    backoff: float,
+    jitter: float,
+) -> Iterator[float]:
+    """Exponentially growing poll delays with +/- ``jitter`` randomization."""
+    interval = initial_interval
+    while True:
+        yield interval * random.uniform(1 - jitter, 1 + jitter)
+        interval = min(interval * backoff, max_interval)
+
+
+def _log_wait_result(result: ResourceStatus) -> None:
+    if result.active:
+        logger.info(f"Resource Active: {result.resource_arn}")
+    elif result.failed:
+        logger.error(
+            f"Creation Failed: {result.resource_arn}, "
+            f"Status: {result.status}, Reason: {result.failure_reason}"
+        )
+    else:
+        logger.warning(
+            f"Monitoring Timeout: {result.resource_arn}, "
+            f"Last Status: {result.status}"
+        )
+
+
+def wait_for_resource(
+    resource_arn: str,
+    resource_type: PersonalizeResources,
+    personalize: Optional[PersonalizeClient] = None,
+    timeout: Optional[float] = None,
+    initial_interval: float = 5.0,
+    max_interval: float = 300.0,
+    backoff: float = 2.0,
+    jitter: float = 0.1,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> ResourceStatus:
+    """Poll a resource until it is active, failed or ``timeout`` passes.
+
+    Polls start every ``initial_interval`` seconds and back off
+    exponentially up to ``max_interval``. ``timeout`` defaults to the
+    resource type's entry in DEFAULT_WAIT_TIMEOUTS. Check ``done`` on the
+    returned status to tell a timeout apart.
+    """
+    personalize = personalize or get_personalize_client()
+    if timeout is None:
+        timeout = DEFAULT_WAIT_TIMEOUTS[resource_type]
+    deadline = clock() + timeout
+    logger.info(f"Monitoring Resource Status: {resource_arn}")
+    delays = _poll_delays(initial_interval, max_interval, backoff, jitter)
+    while True:
+        result = get_resource_status(resource_arn, resource_type, personalize)
+        remaining = deadline - clock()
+        if result.done or remaining <= 0:
+            break
+        sleep(min(next(delays), remaining))
+    _log_wait_result(result)
+    return result
+
+
+async def async_wait_for_resource(
+    resource_arn: str,
+    resource_type: PersonalizeResources,
+    personalize: Optional[PersonalizeClient] = None,
+    timeout: Optional[float] = None,
+    initial_interval: float = 5.0,
+    max_interval: float = 300.0,
+    backoff: float = 2.0,
+    jitter: float = 0.1,
+    clock: Callable[[], float] = time.monotonic,
+) -> ResourceStatus:
+    """Async variant of ``wait_for_resource``.
+
+    Describe calls run in a worker thread and waits use ``asyncio.sleep``,
+    so the event loop is never blocked.
+    """
+    personalize = personalize or get_personalize_client()
+    if timeout is None:
+        timeout = DEFAULT_WAIT_TIMEOUTS[resource_type]
+    deadline = clock() + timeout
+    logger.info(f"Monitoring Resource Status: {resource_arn}")
+    delays = _poll_delays(initial_interval, max_interval, backoff, jitter)
+    while True:
+        result = await asyncio.to_thread(
+            get_resource_status, resource_arn, resource_type, personalize
+        )
+        remaining = deadline - clock()
+        if result.done or remaining <= 0:
+            break
+        await asyncio.sleep(min(next(delays), remaining))
+    _log_wait_result(result)
+    return result
 
 
 def check_active(
     resource_arn: str,
     resource_type: PersonalizeResources,
     interval: int = 5,
-    max_duration: int = 60,
+    max_duration: Optional[int] = None,
+    personalize: Optional[PersonalizeClient] = None,
 ) -> bool:
-    personalize = get_personalize_client()
-    resource_types_collection: Dict[str, ResoureDesciption] = {
-        "dataset": {
-            "func": personalize.describe_dataset,
-            "arg": {"datasetArn": resource_arn},
-        },
-        "dataset-import-job": {
-            "func": personalize.describe_dataset_import_job,
-            "arg": {"datasetImportJobArn": resource_arn},
-        },
-        "solution-version": {
-            "func": personalize.describe_solution_version,
-            "arg": {"solutionVersionArn": resource_arn},
-        },
-        "batch-inference-job": {
-            "func": personalize.describe_batch_inference_job,
-            "arg": {"batchInferenceJobArn": resource_arn},
-        },
-        "filter": {
-            "func": personalize.describe_filter,
-            "arg": {"filterArn": resource_arn},
-        },
-        "solution": {
-            "func": personalize.describe_solution,
-            "arg": {"solutionArn": resource_arn},
-        },
-    }
-
-    max_time = time.time() + max_duration
-    logger.info(f"Monitoring Resource Status: {resource_arn}")
-    target_resource = resource_types_collection[resource_type]
-    while time.time() < max_time:
-        response = target_resource["func"](**target_resource["arg"])
-        for values in response.values():
-            if "status" in values.keys():
-                status = values["status"]
-                break
-            else:
-                logger.error(f"No Status for Resource: {resource_arn}")
-                return False
-
-        if status == "ACTIVE":
-            logger.info(f"Resource Active: {resource_arn}")
-            return True
-        elif status == "CREATE FAILED":
-            logger.error(f"Creation Failed: {resource_arn}")
-            return False
-        else:
-            time.sleep(interval)
-    logger.warning(
-        f"Monitoring Timeout: {resource_arn}, Last Status: {status}"
-    )
-    return False
+    """Wait for a resource and return whether it became active.
+
+    ``interval`` is the first poll interval and ``max_duration`` defaults to
+    the resource type's entry in DEFAULT_WAIT_TIMEOUTS.
+    """
+    return wait_for_resource(
+        resource_arn,
+        resource_type,
+        personalize=personalize,
+        timeout=max_duration,
+        initial_interval=interval,
+    ).active
+
+
+@dataclass
+class _MonitoredResource:
+    resource_arn: str
+    resource_type: PersonalizeResources
+    deadline: float
+    delays: Iterator[float]
+    next_poll: float
+
+
+class ResourceMonitor:
+    """Wait for many resources at once on a shared polling schedule.
+
+    Every resource backs off like ``wait_for_resource``, but all resources
+    due within ``coalesce_window`` seconds of each other are polled in the
+    same round and describe calls are spaced to at most
+    ``max_calls_per_second`` across the whole monitor. Completed resources
+    (active, failed or timed out) are yielded by ``as_completed`` or
+    ``async_as_completed`` as soon as they are seen. A describe call that
+    raises a ClientError completes only that resource, with status
+    ``DESCRIBE FAILED`` and the error as its failure reason.
+    """
+
+    def __init__(
+        self,
+        personalize: Optional[PersonalizeClient] = None,
+        max_calls_per_second: float = 5.0,
+        coalesce_window: float = 1.0,
+        initial_interval: float = 5.0,
+        max_interval: float = 300.0,
+        backoff: float = 2.0,
+        jitter: float = 0.1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.personalize = personalize or get_personalize_client()
+        self.max_calls_per_second = max_calls_per_second
+        self.coalesce_window = coalesce_window
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.api_calls = 0
+        self._pending: Dict[str, _MonitoredResource] = {}
+        self._next_call = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(
+        self,
+        resource_arn: str,
+        resource_type: PersonalizeResources,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Start tracking a resource. Adding a tracked ARN again is a no-op."""
+        if resource_arn in self._pending:
+            return
+        if timeout is None:
+            timeout = DEFAULT_WAIT_TIMEOUTS[resource_type]
+        now = self.clock()
+        self._pending[resource_arn] = _MonitoredResource(
+            resource_arn=resource_arn,
+            resource_type=resource_type,
+            deadline=now + timeout,
+            delays=_poll_delays(
+                self.initial_interval,
+                self.max_interval,
+                self.backoff,
+                self.jitter,
+            ),
+            next_poll=now,
+        )
+        logger.info(f"Monitoring Resource Status: {resource_arn}")
+
+    def _due(self) -> Tuple[List[_MonitoredResource], float]:
+        """Resources to poll this round, or the seconds until the next one."""
+        now = self.clock()
+        cutoff = now + self.coalesce_window
+        due = [r for r in self._pending.values() if r.next_poll <= cutoff]
+        if due:
+            return due, 0.0
+        return due, min(r.next_poll for r in self._pending.values()) - now
+
+    def _throttle_delay(self) -> float:
+        now = self.clock()
+        delay = max(0.0, self._next_call - now)
+        self._next_call = max(now, self._next_call) + (
+            1.0 / self.max_calls_per_second
+        )
+        return delay
+
+    @staticmethod
+    def _describe_failed(
+        resource: _MonitoredResource,
+        error: Exception,
+    ) -> ResourceStatus:
+        # botocore has already retried throttling, so only this resource
+        # is given up on and the others are still watched
+        return ResourceStatus(
+            resource_arn=resource.resource_arn,
+            resource_type=resource.resource_type,
+            status=DESCRIBE_FAILED_STATUS,
+            failure_reason=str(error),
+        )
+
+    def _update(
+        self,
+        resource: _MonitoredResource,
+        result: ResourceStatus,
+    ) -> Optional[ResourceStatus]:
+        self.api_calls += 1
+        now = self.clock()
+        if result.done or now >= resource.deadline:
+            del self._pending[resource.resource_arn]
+            _log_wait_result(result)
+            return result
+        resource.next_poll = min(
+            now + next(resource.delays), resource.deadline
+        )
+        return None
+
+    def as_completed(self) -> Iterator[ResourceStatus]:
+        while self._pending:
+            due, wait = self._due()
+            if not due:
+                self.sleep(wait)
+                continue
+            for resource in due:
+                delay = self._throttle_delay()
+                if delay > 0:
+                    self.sleep(delay)
+                try:
+                    result = get_resource_status(
+                        resource.resource_arn,
+                        resource.resource_type,
+                        self.personalize,
+                    )
+                except (
+                    self.personalize.exceptions.ClientError,
+                    BotoCoreError,
+                ) as e:
+                    result = self._describe_failed(resource, e)
+                finished = self._update(resource, result)
+                if finished is not None:
+                    yield finished
+
+    async def async_as_completed(self) -> AsyncIterator[ResourceStatus]:
+        while self._pending:
+            due, wait = self._due()
+            if not due:
+                await asyncio.sleep(wait)
+                continue
+            for resource in due:
+                delay = self._throttle_delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    result = await asyncio.to_thread(
+                        get_resource_status,
+                        resource.resource_arn,
+                        resource.resource_type,
+                        self.personalize,
+                    )
+                except (
+                    self.personalize.exceptions.ClientError,
+                    BotoCoreError,
+                ) as e:
+                    result = self._describe_failed(resource, e)
+                finished = self._update(resource, result)
+                if finished is not None:
+                    yield finished
+
+    def wait(self) -> Dict[str, ResourceStatus]:
+        """Block until every tracked resource is done, keyed by ARN."""
+        return {
+            result.resource_arn: result for result in self.as_completed()
+        }
+
+
+@dataclass
+class ImportJobResult:
+    """Outcome of one dataset's import submitted by ``create_import_jobs``."""
+
+    dataset_arn: str
+    data_path: str
+    import_job_arn: Optional[str] = None
+    status: Optional[ResourceStatus] = None
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status is not None and self.status.active
+
+
+def create_import_jobs(
+    imports: Dict[str, str],
+    import_mode: ImportModeType,
+    role_arn: str,
+    timeout: Optional[float] = None,
+    monitor: Optional[ResourceMonitor] = None,
+) -> Dict[str, ImportJobResult]:
+    """Import into several datasets concurrently.
+
+    ``imports`` maps dataset ARNs to S3 data paths. Every job is submitted
+    before any is waited on, then all are watched by one ResourceMonitor.
+    A failed submission or a failed job is reported on that dataset's
+    result and does not stop the others. Results are keyed by dataset ARN.
+    """
+    if monitor is None:
+        monitor = ResourceMonitor()
+    results: Dict[str, ImportJobResult] = {}
+    by_job_arn: Dict[str, ImportJobResult] = {}
+    for dataset_arn, data_path in imports.items():
+        result = ImportJobResult(dataset_arn=dataset_arn, data_path=data_path)
+        results[dataset_arn] = result
+        try:
+            result.import_job_arn = create_import_job(
+                data_path=data_path,
+                dataset_arn=dataset_arn,
+                import_mode=import_mode,
+                role_arn=role_arn,
+                wait=False,
+                personalize=monitor.personalize,
+            )
+        except monitor.personalize.exceptions.ClientError as e:
+            result.error = str(e)
+            logger.error(f"{dataset_arn} Import Job Submission Failed: {e}")
+            continue
+        by_job_arn[result.import_job_arn] = result
+        monitor.add(result.import_job_arn, "dataset-import-job", timeout)
+
+    for status in monitor.as_completed():
+        result = by_job_arn.get(status.resource_arn)
+        if result is None:
+            continue
+        result.status = status
+        if status.failed:
+            result.error = status.failure_reason or status.status
+        elif not status.active:
+            result.error = f"Timed out in status {status.status}"
+    return results
 
 
 def get_solution(
@@ -308,22 +896,31 @@ def get_solution(
     recipe_arn: Optional[str] = None,
     tags: Optional[Sequence[TagTypeDef]] = None,
     soltion_config: Optional[SolutionConfigTypeDef] = None,
+    personalize: Optional[PersonalizeClient] = None,
 ) -> str:
-    personalize = get_personalize_client()
+    personalize = personalize or get_personalize_client()
     if recipe_arn is not None:
         create_solution = partial(
             personalize.create_solution,
             name=solution_name,
             datasetGroupArn=dataset_group_arn,
             recipeArn=recipe_arn,
-            tags=tags,
         )
         if soltion_config is not None:
-            partial(create_solution, solutionConfig=soltion_config)
+            create_solution = partial(
+                create_solution, solutionConfig=soltion_config
+            )
         if tags is not None:
-            partial(create_solution, tags=tags)
+            create_solution = partial(create_solution, tags=tags)
         response = create_solution()
         solution_arn = response["solutionArn"]
+        RESOURCE_ARN_INDEX.add(
+            personalize,
+            "solution",
+            solution_name,
+            solution_arn,
+            datasetGroupArn=dataset_group_arn,
+        )
         logger.info(f"New Solution: {solution_arn}")
     else:
         solution_arn = get_exsiting_resouce_arn(
@@ -341,8 +938,9 @@ def get_solution_version(
     solution_arn: str,
     training_mode: Optional[TrainingModeType] = None,
     tags: Optional[Sequence[TagTypeDef]] = None,
+    personalize: Optional[PersonalizeClient] = None,
 ) -> str:
-    personalize = get_personalize_client()
+    personalize = personalize or get_personalize_client()
     if training_mode is not None:
         create_solution_version = partial(
             personalize.create_solution_version,
@@ -352,9 +950,19 @@ def get_solution_version(
         )
         # check_active(resource_arn=)
         if tags is not None:
-            partial(create_solution_version, tags=tags)
+            create_solution_version = partial(
+                create_solution_version, tags=tags
+            )
         response = create_solution_version()
         solution_version_arn = response["solutionVersionArn"]
+        # Solution versions are looked up by the last part of their ARN
+        RESOURCE_ARN_INDEX.add(
+            personalize,
+            "solution-version",
+            solution_version_arn.split("/")[-1],
+            solution_version_arn,
+            solutionArn=solution_arn,
+        )
         logger.info(f"New Solution Version: {solution_version_arn}")
     else:
         solution_version_arn = get_exsiting_resouce_arn(
@@ -378,9 +986,10 @@ def get_filter(
         str
     ] = None,  # https://docs.aws.amazon.com/personalize/latest/dg/filter-expressions.html
     tags: Optional[Sequence[TagTypeDef]] = None,
+    personalize: Optional[PersonalizeClient] = None,
 ) -> str:
     """Input name of existing filter with new filter expression will NOT update the filter"""
-    personalize = get_personalize_client()
+    personalize = personalize or get_personalize_client()
     if filter_expression is not None:
         response = personalize.create_filter(
             name=filter_name,
@@ -390,6 +999,13 @@ def get_filter(
         filter_arn = response["filterArn"]
         if tags is not None:
             personalize.tag_resource(resourceArn=filter_arn, tags=tags)
+        RESOURCE_ARN_INDEX.add(
+            personalize,
+            "filter",
+            filter_name,
+            filter_arn,
+            datasetGroupArn=dataset_group_arn,
+        )
         logger.info(f"New Filter: {filter_arn}")
     else:
         filter_arn = get_exsiting_resouce_arn(
@@ -414,9 +1030,9 @@ def create_batch_inference_job(
     role_arn: str ,
     filter_arn: Optional[str] = None,
     tags: Optional[Sequence[TagTypeDef]] = None,
-    
+    personalize: Optional[PersonalizeClient] = None,
 ) -> str:
-    personalize = get_personalize_client()
+    personalize = personalize or get_personalize_client()
     create_batch_inference_job = partial(
         personalize.create_batch_inference_job,
         solutionVersionArn=solution_version_arn,
@@ -426,9 +1042,222 @@ def create_batch_inference_job(
         jobOutput={"s3DataDestination": {"path": s3_output_path}},
     )
     if filter_arn is not None:
-        partial(create_batch_inference_job, filterArn=filter_arn)
+        create_batch_inference_job = partial(
+            create_batch_inference_job, filterArn=filter_arn
+        )
     if tags is not None:
-        partial(create_batch_inference_job, tags=tags)
+        create_batch_inference_job = partial(
+            create_batch_inference_job, tags=tags
+        )
     response = create_batch_inference_job()
     return response["batchInferenceJobArn"]
 
+
+# Personalize rejects batch inference input files above 1 GB
+DEFAULT_MAX_SHARD_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_CONCURRENT_BATCH_JOBS = 5
+# Longest jobName CreateBatchInferenceJob accepts
+MAX_BATCH_INFERENCE_JOB_NAME_LENGTH = 63
+
+
+@dataclass
+class BatchInferenceShard:
+    """One shard of a sharded batch inference run."""
+
+    index: int
+    input_path: str
+    output_path: str
+    job_arn: Optional[str] = None
+    status: Optional[ResourceStatus] = None
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status is not None and self.status.active
+
+
+@dataclass
+class ShardedBatchInferenceResult:
+    """Shards of a sharded batch inference run and where results landed."""
+
+    output_path: str
+    shards: List[BatchInferenceShard]
+    result_paths: List[str]
+
+    @property
+    def succeeded(self) -> bool:
+        return all(shard.succeeded for shard in self.shards)
+
+
+def shard_jsonl(
+    s3_input_path: str,
+    s3_shard_prefix: str,
+    max_shard_bytes: int = DEFAULT_MAX_SHARD_BYTES,
+    s3_client: Optional["S3Client"] = None,
+) -> List[str]:
+    """Split a S3 JSONL object into shards of roughly equal size.
+
+    The number of shards is the fewest that keeps every shard under
+    ``max_shard_bytes``, and lines are never split. Shards are streamed
+    through local temporary files and uploaded as
+    ``{s3_shard_prefix}/part-00000.jsonl``, ... Returns the shard S3 URIs.
+    """
+    s3_client = s3_client or s3.create_s3_client()
+    bucket, key = s3.parse_s3_uri(s3_input_path)
+    shard_bucket, shard_key_prefix = s3.parse_s3_uri(
+        s3_shard_prefix.rstrip("/")
+    )
+    size = s3_client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+    shard_count = max(1, math.ceil(size / max_shard_bytes))
+
+    shard_paths: List[str] = []
+    shard_file = tempfile.TemporaryFile()
+    shard_bytes = 0
+    # Re-aim at an even split of what is left after every shard, so the
+    # rounding of line boundaries does not pile up in the last shard
+    target_bytes = math.ceil(size / shard_count)
+
+    def upload() -> None:
+        nonlocal shard_file, shard_bytes, size, target_bytes
+        shard_key = f"{shard_key_prefix}/part-{len(shard_paths):05d}.jsonl"
+        shard_file.seek(0)
+        s3_client.upload_fileobj(shard_file, shard_bucket, shard_key)
+        shard_file.close()
+        shard_paths.append(f"s3://{shard_bucket}/{shard_key}")
+        size -= shard_bytes
+        remaining_shards = max(1, shard_count - len(shard_paths))
+        target_bytes = math.ceil(size / remaining_shards)
+        shard_file = tempfile.TemporaryFile()
+        shard_bytes = 0
+
+    for line in s3.iter_lines(bucket, key, s3_client):
+        if shard_bytes and shard_bytes + len(line) > max_shard_bytes:
+            upload()
+        shard_file.write(line)
+        shard_bytes += len(line)
+        if shard_bytes >= target_bytes and len(shard_paths) < shard_count - 1:
+            upload()
+    if shard_bytes:
+        upload()
+    shard_file.close()
+    logger.info(f"Split {s3_input_path} into {len(shard_paths)} shards")
+    return shard_paths
+
+
+def _stitch_batch_outputs(
+    shards: List[BatchInferenceShard],
+    s3_output_path: str,
+    s3_client: "S3Client",
+) -> List[str]:
+    """Copy each finished shard's ``.out`` files into one result prefix."""
+    bucket, key_prefix = s3.parse_s3_uri(s3_output_path.rstrip("/"))
+    result_paths = []
+    for shard in shards:
+        if not shard.succeeded:
+            continue
+        shard_bucket, shard_prefix = s3.parse_s3_uri(shard.output_path)
+        for shard_key in s3.list_keys(shard_bucket, shard_prefix, s3_client):
+            if not shard_key.endswith(".out"):
+                continue
+            result_key = f"{key_prefix}/{shard_key.split('/')[-1]}"
+            s3.copy(shard_bucket, shard_key, bucket, result_key, s3_client)
+            result_paths.append(f"s3://{bucket}/{result_key}")
+    return result_paths
+
+
+def create_sharded_batch_inference_job(
+    job_name: str,
+    solution_version_arn: str,
+    s3_input_path: str,
+    s3_output_path: str,
+    role_arn: str,
+    filter_arn: Optional[str] = None,
+    tags: Optional[Sequence[TagTypeDef]] = None,
+    max_shard_bytes: int = DEFAULT_MAX_SHARD_BYTES,
+    max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_BATCH_JOBS,
+    timeout: Optional[float] = None,
+    monitor: Optional[ResourceMonitor] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> ShardedBatchInferenceResult:
+    """Run batch inference over a large JSONL input as parallel shards.
+
+    The input is split by ``shard_jsonl`` into ``{s3_output_path}/_shards/
+    input/``, one job per shard writes to ``_shards/output/part-NNNNN/`` and
+    at most ``max_concurrent_jobs`` jobs run at a time. When every job is
+    done, the ``.out`` files of the successful shards are copied to
+    ``s3_output_path`` in shard order. Failed shards are reported on the
+    result and leave the others running. Shard jobs are named
+    ``{job_name}-NNNNN``, so ``job_name`` must leave room for the suffix
+    within ``MAX_BATCH_INFERENCE_JOB_NAME_LENGTH``.
+    """
+    if len(f"{job_name}-00000") > MAX_BATCH_INFERENCE_JOB_NAME_LENGTH:
+        raise ValueError(
+            f"The shard job names of {job_name} would be longer than "
+            f"{MAX_BATCH_INFERENCE_JOB_NAME_LENGTH} characters"
+        )
+    s3_client = s3_client or s3.create_s3_client()
+    if monitor is None:
+        monitor = ResourceMonitor()
+    s3_output_path = s3_output_path.rstrip("/")
+    shard_paths = shard_jsonl(
+        s3_input_path,
+        f"{s3_output_path}/_shards/input",
+        max_shard_bytes=max_shard_bytes,
+        s3_client=s3_client,
+    )
+    shards = [
+        BatchInferenceShard(
+            index=index,
+            input_path=input_path,
+            output_path=f"{s3_output_path}/_shards/output/part-{index:05d}/",
+        )
+        for index, input_path in enumerate(shard_paths)
+    ]
+    queued = list(reversed(shards))
+    by_job_arn: Dict[str, BatchInferenceShard] = {}
+    # Shard jobs still running, apart from anything else on the monitor
+    running = set()
+
+    def submit_next() -> None:
+        while queued and len(running) < max_concurrent_jobs:
+            shard = queued.pop()
+            try:
+                shard.job_arn = create_batch_inference_job.fn(
+                    job_name=f"{job_name}-{shard.index:05d}",
+                    solution_version_arn=solution_version_arn,
+                    s3_input_path=shard.input_path,
+                    s3_output_path=shard.output_path,
+                    role_arn=role_arn,
+                    filter_arn=filter_arn,
+                    tags=tags,
+                    personalize=monitor.personalize,
+                )
+            except monitor.personalize.exceptions.ClientError as e:
+                shard.error = str(e)
+                logger.error(
+                    f"{shard.input_path} Batch Job Submission Failed: {e}"
+                )
+                continue
+            by_job_arn[shard.job_arn] = shard
+            running.add(shard.job_arn)
+            monitor.add(shard.job_arn, "batch-inference-job", timeout)
+
+    submit_next()
+    for status in monitor.as_completed():
+        shard = by_job_arn.get(status.resource_arn)
+        if shard is None:
+            continue
+        running.discard(status.resource_arn)
+        shard.status = status
+        if status.failed:
+            shard.error = status.failure_reason or status.status
+        elif not status.active:
+            shard.error = f"Timed out in status {status.status}"
+        submit_next()
+
+    result_paths = _stitch_batch_outputs(shards, s3_output_path, s3_client)
+    return ShardedBatchInferenceResult(
+        output_path=s3_output_path,
+        shards=shards,
+        result_paths=result_paths,
+    )
@@ -0,0 +1,565 @@
+"""Provision a whole Personalize dataset group from a declarative spec.
+
+The spec is turned into a graph of steps (schemas, dataset group, datasets,
+imports, filters, solutions and solution versions). Steps run on a thread
+pool as soon as the steps they depend on are done, so independent branches
+wait on AWS side by side. Every step looks up an existing resource before
+creating one, so running the same spec twice creates nothing new.
+"""
+
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypedDict,
+)
+
+from my_utils.aws import s3
+from my_utils.aws.personalize import (
+    AWSPersonalizeDatasetType,
+    PersonalizeResources,
+    create_import_job,
+    describe_resource,
+    get_dataset,
+    get_dataset_group,
+    get_exsiting_resouce_arn,
+    get_filter,
+    get_import_job_name,
+    get_personalize_client,
+    get_solution,
+    get_solution_version,
+    prepare_schema,
+    wait_for_resource,
+)
+from my_utils.log import logger
+from mypy_boto3_personalize.client import PersonalizeClient
+from mypy_boto3_personalize.literals import ImportModeType, TrainingModeType
+from mypy_boto3_personalize.type_defs import TagTypeDef
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+
+class DatasetSpec(TypedDict, total=False):
+    schema_path: str
+    data_path: str
+    import_mode: ImportModeType
+
+
+class SolutionSpec(TypedDict, total=False):
+    recipe_arn: str
+    version_name: str
+    training_mode: TrainingModeType
+    retrain: bool
+
+
+class ProvisioningSpec(TypedDict, total=False):
+    dataset_group: str
+    role_arn: str
+    tags: List[TagTypeDef]
+    datasets: Dict[AWSPersonalizeDatasetType, DatasetSpec]
+    filters: Dict[str, str]
+    solutions: Dict[str, SolutionSpec]
+
+
+StepFunction = Callable[[Dict[str, str]], str]
+
+
+@dataclass
+class ProvisioningStep:
+    """A named unit of work that runs once its dependencies have ARNs.
+
+    ``run`` receives the ARNs of the finished steps, keyed by step name.
+    """
+
+    name: str
+    run: StepFunction
+    depends_on: Tuple[str, ...] = ()
+
+
+@dataclass
+class StepResult:
+    name: str
+    arn: Optional[str] = None
+    error: Optional[BaseException] = None
+    started: float = 0.0
+    finished: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class ProvisioningReport:
+    """Per-step results of a provisioning run and its critical path."""
+
+    results: Dict[str, StepResult]
+    wall_time: float
+    critical_path: List[str] = field(default_factory=list)
+
+    @property
+    def arns(self) -> Dict[str, str]:
+        return {
+            name: result.arn
+            for name, result in self.results.items()
+            if result.arn is not None
+        }
+
+    @property
+    def succeeded(self) -> bool:
+        return all(result.error is None for result in self.results.values())
+
+    @property
+    def critical_path_seconds(self) -> float:
+        return sum(self.results[name].duration for name in self.critical_path)
+
+
+def load_provisioning_spec(spec_path: str) -> ProvisioningSpec:
+    """Load a spec from a JSON or YAML file. YAML needs PyYAML installed."""
+    with open(spec_path) as f:
+        if spec_path.endswith((".yaml", ".yml")):
+            import yaml
+
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _wait_active(
+    resource_arn: str,
+    resource_type: PersonalizeResources,
+    personalize: PersonalizeClient,
+) -> str:
+    result = wait_for_resource(resource_arn, resource_type, personalize)
+    if not result.active:
+        raise RuntimeError(
+            f"{resource_arn} is {result.status}: {result.failure_reason}"
+        )
+    return resource_arn
+
+
+def _latest_solution_version_arn(
+    solution_arn: str,
+    personalize: PersonalizeClient,
+) -> str:
+    """Newest solution version of a solution that has not failed."""
+    paginator = personalize.get_paginator("list_solution_versions")
+    versions = [
+        version
+        for page in paginator.paginate(solutionArn=solution_arn)
+        for version in page["solutionVersions"]
+        if not version["status"].endswith("FAILED")
+    ]
+    if not versions:
+        return ""
+    latest = max(versions, key=lambda version: version["creationDateTime"])
+    return latest["solutionVersionArn"]
+
+
+def _existing_import_job_arn(
+    dataset_arn: str,
+    data_path: str,
+    personalize: PersonalizeClient,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """ARN of the job that already imported ``data_path`` into a dataset.
+
+    Import jobs are named after the file, so a file that changed since
+    would silently not be imported again; that raises RuntimeError instead.
+    """
+    import_job_arn = "{}:dataset-import-job/{}".format(
+        dataset_arn.split(":dataset/")[0],
+        get_import_job_name(dataset_arn, data_path),
+    )
+    created = describe_resource(
+        import_job_arn, "dataset-import-job", personalize
+    )["creationDateTime"]
+    s3_client = s3_client or s3.create_s3_client()
+    bucket, key = s3.parse_s3_uri(data_path)
+    modified = s3_client.head_object(Bucket=bucket, Key=key)["LastModified"]
+    if modified > created:
+        raise RuntimeError(
+            f"{data_path} was modified at {modified.isoformat()}, after "
+            f"{import_job_arn} imported it at {created.isoformat()}. The "
+            "job name is taken by the old data, upload the new data under "
+            "a new key to import it."
+        )
+    logger.info(f"Existing Import Job: {import_job_arn}")
+    return import_job_arn
+
+
+def build_provisioning_steps(
+    spec: ProvisioningSpec,
+    personalize: Optional[PersonalizeClient] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> Dict[str, ProvisioningStep]:
+    """Turn a spec into provisioning steps keyed by step name.
+
+    Step names are ``dataset-group``, ``schema:<type>``, ``dataset:<type>``,
+    ``import:<type>``, ``filter:<name>``, ``solution:<name>`` and
+    ``solution-version:<name>``. Filters and solutions wait for every
+    dataset to exist; solution versions also wait for every import. An
+    import first validates its data against the dataset's ``schema_path``,
+    if given, and fails if its job already exists and the data changed
+    since.
+    """
+    personalize = personalize or get_personalize_client()
+    dataset_group_name = spec["dataset_group"]
+    tags = spec.get("tags")
+    steps: Dict[str, ProvisioningStep] = {}
+
+    def add(name: str, run: StepFunction, *depends_on: str) -> None:
+        steps[name] = ProvisioningStep(name, run, tuple(depends_on))
+
+    def dataset_group(arns: Dict[str, str]) -> str:
+        dataset_group_arn = get_exsiting_resouce_arn(
+            resource_name=dataset_group_name,
+            resource_type="dataset-group",
+            personalize=personalize,
+        ) or get_dataset_group.fn(dataset_group_name, personalize, tags)
+        return _wait_active(dataset_group_arn, "dataset-group", personalize)
+
+    add("dataset-group", dataset_group)
+
+    dataset_steps = []
+    import_steps = []
+    for dataset_type, dataset_spec in spec.get("datasets", {}).items():
+        dataset_name = f"{dataset_group_name}_{dataset_type}"
+        schema_step = f"schema:{dataset_type}"
+        dataset_step = f"dataset:{dataset_type}"
+        dataset_steps.append(dataset_step)
+
+        def schema(
+            arns: Dict[str, str],
+            dataset_name: str = dataset_name,
+            dataset_spec: DatasetSpec = dataset_spec,
+        ) -> str:
+            schema_arn = get_exsiting_resouce_arn(
+                resource_name=dataset_name,
+                resource_type="schema",
+                personalize=personalize,
+            )
+            if schema_arn:
+                return schema_arn
+            if "schema_path" not in dataset_spec:
+                raise ValueError(
+                    f"Schema '{dataset_name}' does not exist and no "
+                    "schema_path is given"
+                )
+            return prepare_schema(
+                schema_name=dataset_name,
+                personalize=personalize,
+                schema_path=dataset_spec["schema_path"],
+            )
+
+        def dataset(
+            arns: Dict[str, str],
+            dataset_name: str = dataset_name,
+            dataset_type: AWSPersonalizeDatasetType = dataset_type,
+            schema_step: str = schema_step,
+        ) -> str:
+            dataset_group_arn = arns["dataset-group"]
+            dataset_arn = get_exsiting_resouce_arn(
+                resource_name=dataset_name,
+                resource_type="dataset",
+                personalize=personalize,
+                datasetGroupArn=dataset_group_arn,
+            ) or get_dataset(
+                dataset_group_arn=dataset_group_arn,
+                dataset_type=dataset_type,
+                tags=tags,
+                schema_arn=arns[schema_step],
+                personalize=personalize,
+            )
+            return _wait_active(dataset_arn, "dataset", personalize)
+
+        add(schema_step, schema)
+        add(dataset_step, dataset, "dataset-group", schema_step)
+
+        if "data_path" not in dataset_spec:
+            continue
+
+        def import_data(
+            arns: Dict[str, str],
+            dataset_spec: DatasetSpec = dataset_spec,
+            dataset_step: str = dataset_step,
+        ) -> str:
+            dataset_arn = arns[dataset_step]
+            data_path = dataset_spec["data_path"]
+            try:
+                import_job_arn = create_import_job(
+                    data_path=data_path,
+                    dataset_arn=dataset_arn,
+                    import_mode=dataset_spec.get("import_mode", "FULL"),
+                    role_arn=spec["role_arn"],
+                    wait=False,
+                    personalize=personalize,
+                    schema_path=dataset_spec.get("schema_path"),
+                    s3_client=s3_client,
+                )
+            except personalize.exceptions.ResourceAlreadyExistsException:
+                import_job_arn = _existing_import_job_arn(
+                    dataset_arn, data_path, personalize, s3_client
+                )
+            return _wait_active(
+                import_job_arn, "dataset-import-job", personalize
+            )
+
+        import_step = f"import:{dataset_type}"
+        import_steps.append(import_step)
+        add(import_step, import_data, dataset_step)
+
+    for filter_name, filter_expression in spec.get("filters", {}).items():
+
+        def create_filter(
+            arns: Dict[str, str],
+            filter_name: str = filter_name,
+            filter_expression: str = filter_expression,
+        ) -> str:
+            dataset_group_arn = arns["dataset-group"]
+            filter_arn = get_exsiting_resouce_arn(
+                resource_name=filter_name,
+                resource_type="filter",
+                personalize=personalize,
+                datasetGroupArn=dataset_group_arn,
+            ) or get_filter.fn(
+                filter_name=filter_name,
+                dataset_group_arn=dataset_group_arn,
+                filter_expression=filter_expression,
+                tags=tags,
+                personalize=personalize,
+            )
+            return _wait_active(filter_arn, "filter", personalize)
+
+        add(
+            f"filter:{filter_name}",
+            create_filter,
+            "dataset-group",
+            *dataset_steps,
+        )
+
+    for solution_name, solution_spec in spec.get("solutions", {}).items():
+        solution_step = f"solution:{solution_name}"
+
+        def solution(
+            arns: Dict[str, str],
+            solution_name: str = solution_name,
+            solution_spec: SolutionSpec = solution_spec,
+        ) -> str:
+            dataset_group_arn = arns["dataset-group"]
+            solution_arn = get_exsiting_resouce_arn(
+                resource_name=solution_name,
+                resource_type="solution",
+                personalize=personalize,
+                datasetGroupArn=dataset_group_arn,
+            ) or get_solution(
+                solution_name=solution_name,
+                dataset_group_arn=dataset_group_arn,
+                recipe_arn=solution_spec["recipe_arn"],
+                tags=tags,
+                personalize=personalize,
+            )
+            return _wait_active(solution_arn, "solution", personalize)
+
+        def solution_version(
+            arns: Dict[str, str],
+            solution_name: str = solution_name,
+            solution_spec: SolutionSpec = solution_spec,
+            solution_step: str = solution_step,
+        ) -> str:
+            solution_arn = arns[solution_step]
+            solution_version_arn = ""
+            if not solution_spec.get("retrain", False):
+                solution_version_arn = _latest_solution_version_arn(
+                    solution_arn, personalize
+                )
+            if not solution_version_arn:
+                solution_version_arn = get_solution_version(
+                    solution_version_name=solution_spec.get(
+                        "version_name", solution_name
+                    ),
+                    solution_arn=solution_arn,
+                    training_mode=solution_spec.get("training_mode", "FULL"),
+                    tags=tags,
+                    personalize=personalize,
+                )
+            return _wait_active(
+                solution_version_arn, "solution-version", personalize
+            )
+
+        add(solution_step, solution, "dataset-group", *dataset_steps)
+        add(
+            f"solution-version:{solution_name}",
+            solution_version,
+            solution_step,
+            *import_steps,
+        )
+    return steps
+
+
+def _check_dependencies(steps: Dict[str, ProvisioningStep]) -> None:
+    """Raise ValueError on unknown dependencies or dependency cycles."""
+    for step in steps.values():
+        for dependency in step.depends_on:
+            if dependency not in steps:
+                raise ValueError(
+                    f"Step '{step.name}' depends on unknown step "
+                    f"'{dependency}'"
+                )
+    resolved: set = set()
+    remaining = dict(steps)
+    while remaining:
+        ready = [
+            name
+            for name, step in remaining.items()
+            if all(dependency in resolved for dependency in step.depends_on)
+        ]
+        if not ready:
+            raise ValueError(
+                f"Dependency cycle between steps: {sorted(remaining)}"
+            )
+        for name in ready:
+            resolved.add(name)
+            del remaining[name]
+
+
+def _critical_path(
+    steps: Dict[str, ProvisioningStep],
+    results: Dict[str, StepResult],
+) -> List[str]:
+    """Chain of steps, each waiting on the last to finish, ending last."""
+    if not results:
+        return []
+    name: Optional[str] = max(results, key=lambda n: results[n].finished)
+    path = []
+    while name is not None:
+        path.append(name)
+        dependencies = steps[name].depends_on
+        name = (
+            max(dependencies, key=lambda n: results[n].finished)
+            if dependencies
+            else None
+        )
+    return path[::-1]
+
+
+def _run_step(
+    step: ProvisioningStep,
+    arns: Dict[str, str],
+    clock: Callable[[], float],
+) -> StepResult:
+    result = StepResult(name=step.name, started=clock())
+    try:
+        result.arn = step.run(arns)
+    except Exception as e:
+        result.error = e
+        logger.error(f"Provisioning Step Failed: {step.name}, Error: {e}")
+    result.finished = clock()
+    return result
+
+
+def run_provisioning_steps(
+    steps: Dict[str, ProvisioningStep],
+    max_workers: int = 8,
+    clock: Callable[[], float] = time.monotonic,
+) -> ProvisioningReport:
+    """Run steps concurrently, each as soon as its dependencies are done.
+
+    A failed step does not stop independent branches; steps that depend on
+    it are skipped and reported with an error.
+    """
+    _check_dependencies(steps)
+    results: Dict[str, StepResult] = {}
+    waiting = dict(steps)
+    running: Dict[Future, str] = {}
+    start = clock()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def submit_ready() -> None:
+            # Skipping a step can make its dependents ready, so repeat until
+            # nothing changes
+            changed = True
+            while changed:
+                changed = False
+                for name, step in list(waiting.items()):
+                    if any(d not in results for d in step.depends_on):
+                        continue
+                    del waiting[name]
+                    changed = True
+                    failed = [
+                        d
+                        for d in step.depends_on
+                        if results[d].error is not None
+                    ]
+                    if failed:
+                        now = clock()
+                        results[name] = StepResult(
+                            name=name,
+                            error=RuntimeError(
+                                f"Skipped because {failed} failed"
+                            ),
+                            started=now,
+                            finished=now,
+                        )
+                        continue
+                    arns = {d: results[d].arn for d in step.depends_on}
+                    future = executor.submit(_run_step, step, arns, clock)
+                    running[future] = name
+
+        submit_ready()
+        while running:
+            done, _ = wait_futures(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+            submit_ready()
+
+    report = ProvisioningReport(
+        results=results,
+        wall_time=clock() - start,
+        critical_path=_critical_path(steps, results),
+    )
+    logger.info(
+        f"Provisioned {len(results)} steps in {report.wall_time:.0f}s, "
+        f"Critical Path ({report.critical_path_seconds:.0f}s): "
+        + " -> ".join(report.critical_path)
+    )
+    return report
+
+
+def provision(
+    spec: ProvisioningSpec,
+    personalize: Optional[PersonalizeClient] = None,
+    max_workers: int = 8,
+    s3_client: Optional["S3Client"] = None,
+) -> ProvisioningReport:
+    """Create or reuse every resource in ``spec`` and wait for them.
+
+    Example spec::
+
+        {
+            "dataset_group": "shop",
+            "role_arn": "arn:aws:iam::123456789012:role/personalize",
+            "datasets": {
+                "Interactions": {
+                    "schema_path": "schemas/interactions.json",
+                    "data_path": "s3://bucket/interactions.csv",
+                },
+                "Items": {"schema_path": "schemas/items.json"},
+            },
+            "filters": {"unseen": "EXCLUDE ItemID WHERE Interactions..."},
+            "solutions": {
+                "shop-sims": {"recipe_arn": "arn:aws:personalize:::recipe/..."}
+            },
+        }
+    """
+    steps = build_provisioning_steps(spec, personalize, s3_client)
+    return run_provisioning_steps(steps, max_workers=max_workers)
@@ -0,0 +1,463 @@
+"""Check Personalize import CSVs against their Avro schema before importing.
+
+An import job takes minutes to fail on a bad row. ``validate_import_file``
+makes the same checks locally in one pass: the header against the schema
+fields, the type of every value, required (non-nullable) fields and the
+range of timestamp fields. Memory stays constant since only the first
+``max_errors`` errors are kept, and large local files are checked on a
+process pool over ``file_chunks`` ranges. Quoted fields may hold line
+breaks; a file where one spans two ranges is checked serially instead.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from my_utils.aws import s3
+from my_utils.file_chunks import (
+    DEFAULT_CHUNK_SIZE,
+    iter_range_lines,
+    split_line_ranges,
+)
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+TIMESTAMP_FIELDS = ("TIMESTAMP", "CREATION_TIMESTAMP")
+# 2000-01-01, earlier values are usually not epoch seconds
+DEFAULT_MIN_TIMESTAMP = 946684800
+MAX_ID_LENGTH = 256
+
+Schema = Union[str, Dict[str, Any]]
+ValueCheck = Callable[[str], Optional[str]]
+
+
+@dataclass
+class RowError:
+    """A value that Personalize would reject.
+
+    ``line`` is 1-based and counts the header line.
+    """
+
+    line: int
+    column: str
+    value: str
+    message: str
+
+
+@dataclass
+class _LinesResult:
+    """Records and physical lines read by ``_validate_lines``.
+
+    ``open_quote`` is set when the lines end inside a quoted field.
+    """
+
+    rows: int
+    lines: int
+    errors: List[RowError]
+    open_quote: bool = False
+
+
+@dataclass
+class ValidationReport:
+    rows: int = 0
+    errors: List[RowError] = field(default_factory=list)
+    header_errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+    bytes: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors and not self.header_errors
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        lines = list(self.header_errors)
+        lines += [
+            f"line {e.line}, {e.column}={e.value!r}: {e.message}"
+            for e in self.errors
+        ]
+        return "\n".join(lines)
+
+
+def load_schema(schema: Schema) -> Dict[str, Any]:
+    """Read an Avro schema given as a dict, a JSON string or a file path."""
+    if isinstance(schema, dict):
+        return schema
+    if schema.lstrip().startswith("{"):
+        return json.loads(schema)
+    with open(schema) as f:
+        return json.load(f)
+
+
+def _field_type(avro_type: Any) -> Tuple[str, bool]:
+    """Base type name of an Avro field type and whether it is nullable."""
+    if isinstance(avro_type, list):
+        types = [t for t in avro_type if t != "null"]
+        return types[0], len(types) < len(avro_type)
+    return avro_type, False
+
+
+def _value_check(
+    name: str,
+    avro_type: str,
+    min_timestamp: int,
+    max_timestamp: int,
+) -> ValueCheck:
+    if avro_type in ("int", "long"):
+        is_timestamp = name.upper() in TIMESTAMP_FIELDS
+
+        def check_int(value: str) -> Optional[str]:
+            try:
+                number = int(value)
+            except ValueError:
+                return f"not an {avro_type}"
+            if is_timestamp and not min_timestamp <= number <= max_timestamp:
+                return (
+                    f"timestamp outside [{min_timestamp}, {max_timestamp}], "
+                    "expected epoch seconds"
+                )
+            return None
+
+        return check_int
+    if avro_type in ("float", "double"):
+
+        def check_float(value: str) -> Optional[str]:
+            try:
+                number = float(value)
+            except ValueError:
+                return f"not a {avro_type}"
+            return None if math.isfinite(number) else "not finite"
+
+        return check_float
+    if avro_type == "boolean":
+
+        def check_boolean(value: str) -> Optional[str]:
+            if value.lower() in ("true", "false"):
+                return None
+            return "not a boolean"
+
+        return check_boolean
+    if avro_type == "string":
+        max_length = MAX_ID_LENGTH if name.upper().endswith("_ID") else None
+
+        def check_string(value: str) -> Optional[str]:
+            if max_length is not None and len(value) > max_length:
+                return f"longer than {max_length} characters"
+            return None
+
+        return check_string
+    raise ValueError(f"Unsupported Avro type '{avro_type}' of '{name}'")
+
+
+@dataclass
+class _CompiledSchema:
+    columns: List[str]
+    checks: List[Tuple[str, bool, ValueCheck]]
+
+
+def _compile_schema(
+    schema: Dict[str, Any],
+    header: List[str],
+    min_timestamp: int,
+    max_timestamp: int,
+) -> Tuple[_CompiledSchema, List[str]]:
+    """Match the header with the schema fields, returning header errors."""
+    fields = {f["name"].upper(): f for f in schema["fields"]}
+    errors = []
+    checks = []
+    for column in header:
+        avro_field = fields.get(column.strip().upper())
+        if avro_field is None:
+            errors.append(f"Column '{column}' is not in the schema")
+            continue
+        avro_type, nullable = _field_type(avro_field["type"])
+        checks.append(
+            (
+                column,
+                nullable,
+                _value_check(
+                    avro_field["name"], avro_type, min_timestamp, max_timestamp
+                ),
+            )
+        )
+    columns = {column.strip().upper() for column in header}
+    for name, avro_field in fields.items():
+        if name not in columns and not _field_type(avro_field["type"])[1]:
+            errors.append(f"Required column '{avro_field['name']}' is missing")
+    return _CompiledSchema(columns=header, checks=checks), errors
+
+
+def _parse_row(line: bytes) -> List[str]:
+    text = line.decode("utf-8").rstrip("\r\n")
+    if '"' not in text:
+        return text.split(",")
+    return next(csv.reader([text]))
+
+
+def _validate_lines(
+    lines: Iterable[bytes],
+    compiled: _CompiledSchema,
+    first_line: int,
+    max_errors: int,
+) -> _LinesResult:
+    """Check records until ``max_errors`` errors.
+
+    A record goes on over the next line while it has an odd number of
+    quotes, i.e. a quoted field holds a line break.
+    """
+    result = _LinesResult(rows=0, lines=0, errors=[])
+    errors = result.errors
+    n_columns = len(compiled.checks)
+    parts: List[bytes] = []
+    quotes = 0
+    for line in lines:
+        if parts or b'"' in line:
+            parts.append(line)
+            quotes += line.count(b'"')
+            if quotes % 2:
+                continue
+            record = b"".join(parts)
+            record_lines = len(parts)
+            parts = []
+            quotes = 0
+        else:
+            record = line
+            record_lines = 1
+        line_number = first_line + result.lines
+        result.rows += 1
+        result.lines += record_lines
+        try:
+            values = _parse_row(record)
+        except (UnicodeDecodeError, csv.Error) as e:
+            errors.append(RowError(line_number, "", "", str(e)))
+        else:
+            if len(values) != n_columns:
+                errors.append(
+                    RowError(
+                        line_number,
+                        "",
+                        "",
+                        f"{len(values)} values for {n_columns} columns",
+                    )
+                )
+            else:
+                for value, (column, nullable, check) in zip(
+                    values, compiled.checks
+                ):
+                    if value == "":
+                        message = None if nullable else "required"
+                    else:
+                        message = check(value)
+                    if message is not None:
+                        errors.append(
+                            RowError(line_number, column, value, message)
+                        )
+        if len(errors) >= max_errors:
+            del errors[max_errors:]
+            return result
+    if parts:
+        result.open_quote = True
+        result.rows += 1
+        errors.append(
+            RowError(
+                first_line + result.lines,
+                "",
+                "",
+                "unterminated quoted field",
+            )
+        )
+        result.lines += len(parts)
+        del errors[max_errors:]
+    return result
+
+
+def _default_max_timestamp() -> int:
+    # Allow for clock skew between this host and the event source
+    return int(time.time()) + 24 * 60 * 60
+
+
+def validate_import_lines(
+    lines: Iterable[bytes],
+    schema: Schema,
+    max_errors: int = 100,
+    min_timestamp: int = DEFAULT_MIN_TIMESTAMP,
+    max_timestamp: Optional[int] = None,
+) -> ValidationReport:
+    """Validate CSV lines, header first, stopping at ``max_errors``.
+
+    ``max_timestamp`` defaults to one day from now.
+    """
+    report = ValidationReport()
+    start = time.perf_counter()
+    lines = iter(lines)
+    header_line = next(lines, None)
+    if header_line is None:
+        report.header_errors.append("The file is empty")
+        return report
+    compiled, report.header_errors = _compile_schema(
+        load_schema(schema),
+        _parse_row(header_line),
+        min_timestamp,
+        max_timestamp or _default_max_timestamp(),
+    )
+    if report.header_errors:
+        return report
+
+    def counted(lines: Iterable[bytes]) -> Iterable[bytes]:
+        for line in lines:
+            report.bytes += len(line)
+            yield line
+
+    report.bytes = len(header_line)
+    result = _validate_lines(counted(lines), compiled, 2, max_errors)
+    report.rows, report.errors = result.rows, result.errors
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _validate_file_range(
+    file_path: str,
+    start: int,
+    end: int,
+    schema: Dict[str, Any],
+    header: List[str],
+    min_timestamp: int,
+    max_timestamp: int,
+    max_errors: int,
+) -> _LinesResult:
+    # Checks are closures, so each worker compiles the schema itself
+    compiled, _ = _compile_schema(schema, header, min_timestamp, max_timestamp)
+    # Line numbers are relative to the range and fixed up by the caller
+    return _validate_lines(
+        iter_range_lines(file_path, start, end), compiled, 0, max_errors
+    )
+
+
+def validate_import_file(
+    file_path: str,
+    schema: Schema,
+    max_errors: int = 100,
+    min_timestamp: int = DEFAULT_MIN_TIMESTAMP,
+    max_timestamp: Optional[int] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ValidationReport:
+    """Validate a local import CSV on a process pool.
+
+    Ranges are checked in parallel with at most ``2 * workers`` in flight
+    and read back in file order, so line numbers are exact. Once
+    ``max_errors`` errors are found the remaining ranges are cancelled.
+    Ranges end on line breaks, so if one ends inside a quoted field the
+    file is checked again with ``validate_import_lines``.
+    """
+    report = ValidationReport()
+    start_time = time.perf_counter()
+    with open(file_path, "rb") as f:
+        header_line = f.readline()
+    if not header_line:
+        report.header_errors.append("The file is empty")
+        return report
+    schema = load_schema(schema)
+    header = _parse_row(header_line)
+    max_timestamp = max_timestamp or _default_max_timestamp()
+    _, report.header_errors = _compile_schema(
+        schema, header, min_timestamp, max_timestamp
+    )
+    if report.header_errors:
+        return report
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+    ranges = [
+        (max(start, len(header_line)), end)
+        for start, end in split_line_ranges(file_path, chunk_size=chunk_size)
+        if end > len(header_line)
+    ]
+
+    lines = 0
+    split_record = False
+
+    def collect(future: Future) -> None:
+        nonlocal lines, split_record
+        result = future.result()
+        if result.open_quote:
+            # The next range starts inside this record
+            split_record = True
+            return
+        for error in result.errors:
+            error.line += lines + 2
+        report.errors += result.errors[: max_errors - len(report.errors)]
+        report.rows += result.rows
+        lines += result.lines
+
+    def done() -> bool:
+        return split_record or len(report.errors) >= max_errors
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque()
+        for start, end in ranges:
+            if done():
+                break
+            pending.append(
+                executor.submit(
+                    _validate_file_range,
+                    file_path,
+                    start,
+                    end,
+                    schema,
+                    header,
+                    min_timestamp,
+                    max_timestamp,
+                    max_errors,
+                )
+            )
+            if len(pending) >= max_in_flight:
+                collect(pending.popleft())
+        while pending and not done():
+            collect(pending.popleft())
+        for future in pending:
+            future.cancel()
+    if split_record:
+        with open(file_path, "rb") as f:
+            report = validate_import_lines(
+                f, schema, max_errors, min_timestamp, max_timestamp
+            )
+    report.bytes = os.path.getsize(file_path)
+    report.seconds = time.perf_counter() - start_time
+    return report
+
+
+def validate_s3_import_file(
+    data_path: str,
+    schema: Schema,
+    max_errors: int = 100,
+    s3_client: Optional[S3Client] = None,
+) -> ValidationReport:
+    """Stream a S3 import CSV through ``validate_import_lines``."""
+    bucket, key = s3.parse_s3_uri(data_path)
+    return validate_import_lines(
+        s3.iter_lines(bucket, key, s3_client), schema, max_errors=max_errors
+    )
@@ -0,0 +1,88 @@
+"""Helpers for reading and writing S3 objects."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
+
+import boto3
+
+from my_utils.aws.session_handler import PerformanceProfile, get_client
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+
+
+def create_s3_client(
+    session: Optional[boto3.Session] = None,
+    performance_profile: Optional[PerformanceProfile] = None,
+) -> S3Client:
+    """Create a S3 Client.
+
+    If no session is passed in, a new session is created to build the client.
+    """
+
+    return get_client(
+        "s3", session=session, performance_profile=performance_profile
+    )
+
+
+def write(
+    body: bytes,
+    bucket: str,
+    key: str,
+    s3_client: Optional[S3Client] = None,
+) -> None:
+    """Write bytes to a S3 object."""
+    if s3_client is None:
+        s3_client = create_s3_client()
+    s3_client.put_object(Body=body, Bucket=bucket, Key=key)
+
+
+def parse_s3_uri(s3_uri: str) -> Tuple[str, str]:
+    """Split ``s3://bucket/key`` into its bucket and key."""
+    if not s3_uri.startswith("s3://"):
+        raise ValueError(f"Not a S3 URI: {s3_uri}")
+    bucket, _, key = s3_uri[len("s3://") :].partition("/")
+    return bucket, key
+
+
+def iter_lines(
+    bucket: str,
+    key: str,
+    s3_client: Optional[S3Client] = None,
+) -> Iterator[bytes]:
+    """Stream the lines of a S3 object, newline included."""
+    if s3_client is None:
+        s3_client = create_s3_client()
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+    for line in body.iter_lines():
+        yield line + b"\n"
+
+
+def list_keys(
+    bucket: str,
+    prefix: str,
+    s3_client: Optional[S3Client] = None,
+) -> List[str]:
+    """List every key under a prefix, in lexicographic order."""
+    if s3_client is None:
+        s3_client = create_s3_client()
+    paginator = s3_client.get_paginator("list_objects_v2")
+    return [
+        content["Key"]
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+        for content in page.get("Contents", [])
+    ]
+
+
+def copy(
+    source_bucket: str,
+    source_key: str,
+    bucket: str,
+    key: str,
+    s3_client: Optional[S3Client] = None,
+) -> None:
+    """Copy a S3 object, using multipart copies for large objects."""
+    if s3_client is None:
+        s3_client = create_s3_client()
+    s3_client.copy({"Bucket": source_bucket, "Key": source_key}, bucket, key)
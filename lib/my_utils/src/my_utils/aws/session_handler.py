@@ -3,18 +3,93 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple, dataclass, field
+from datetime import datetime, timedelta, timezone
 from functools import partial
-from typing import Dict, List, Optional, Union
+from weakref import WeakKeyDictionary
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
 from mypy_boto3_cur.literals import AWSRegionType
 from mypy_boto3_sts import STSClient
-from mypy_boto3_sts.type_defs import AssumeRoleResponseTypeDef
+from mypy_boto3_sts.type_defs import (
+    AssumeRoleResponseTypeDef,
+    CredentialsTypeDef,
+    GetCallerIdentityResponseTypeDef,
+)
 
 
 
 
+_MISSING = object()
+
+PerformanceProfile = Literal["bulk", "interactive"]
+
+# Client configs for high-concurrency batch work and for short interactive
+# calls. Pool size should be at least the number of threads sharing a client.
+PERFORMANCE_PROFILES: Dict[PerformanceProfile, Config] = {
+    "bulk": Config(
+        max_pool_connections=64,
+        retries={"mode": "adaptive", "max_attempts": 10},
+        connect_timeout=10,
+        read_timeout=120,
+        tcp_keepalive=True,
+    ),
+    "interactive": Config(
+        max_pool_connections=10,
+        retries={"mode": "standard", "max_attempts": 3},
+        connect_timeout=3,
+        read_timeout=20,
+        tcp_keepalive=True,
+    ),
+}
+
+
+def get_client_config(
+    performance_profile: Optional[PerformanceProfile] = None,
+    config: Optional[Config] = None,
+) -> Optional[Config]:
+    """Combine a performance profile with an explicit config.
+
+    Options set in ``config`` take precedence over the profile.
+    """
+    if performance_profile is None:
+        return config
+    profile_config = PERFORMANCE_PROFILES[performance_profile]
+    if config is None:
+        return profile_config
+    return profile_config.merge(config)
+
+
+def _new_botocore_session(
+    performance_profile: Optional[PerformanceProfile] = None,
+) -> botocore.session.Session:
+    botocore_session = botocore.session.get_session()
+    if performance_profile is not None:
+        botocore_session.set_default_client_config(
+            PERFORMANCE_PROFILES[performance_profile]
+        )
+    return botocore_session
+
+
 @dataclass
 class AssumeRoleConfig:
     """Parameters needed to assume role using AWS STS."""
@@ -39,45 +114,240 @@ class AccessKeyCredential:
     aws_session_token: str
 
 
+@dataclass
+class PoolStats:
+    """Hit and miss counters of a SessionPool cache."""
+
+    hits: int = 0
+    misses: int = 0
+
+
+def get_credential_identity(session: boto3.Session) -> Hashable:
+    """Identify the credentials behind a session.
+
+    Refreshable credentials rotate their keys, so they are identified by the
+    credentials object itself.
+    """
+
+    credentials = session.get_credentials()
+    if credentials is None:
+        return (session.profile_name, None)
+    if hasattr(credentials, "refresh_needed"):
+        return (session.profile_name, id(credentials))
+    return (session.profile_name, credentials.access_key, credentials.token)
+
+
+def get_config_key(config: Optional[Config]) -> Optional[str]:
+    """Identify a client config by the options set on it."""
+    if config is None:
+        return None
+    options = config._user_provided_options
+    return json.dumps(options, sort_keys=True, default=repr)
+
+
+class SessionPool:
+    """Process-wide LRU cache of boto3 sessions and service clients.
+
+    Clients are keyed on (credential identity, region, service, config
+    options). The pool lock only guards the caches: a missing session is
+    built under a lock for its key, and a missing client under a lock for
+    its session, since boto3 sessions are not thread-safe. Clients
+    themselves are thread-safe and are shared between threads.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.session_stats = PoolStats()
+        self.client_stats = PoolStats()
+        self._sessions: OrderedDict[Hashable, boto3.Session] = OrderedDict()
+        self._clients: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._session_locks: WeakKeyDictionary[
+            boto3.Session, threading.Lock
+        ] = WeakKeyDictionary()
+
+    def _lookup(
+        self, cache: OrderedDict, stats: PoolStats, key: Hashable
+    ) -> Any:
+        # Called with the pool lock held
+        if key not in cache:
+            return _MISSING
+        cache.move_to_end(key)
+        stats.hits += 1
+        return cache[key]
+
+    def _get_or_create(
+        self,
+        cache: OrderedDict,
+        stats: PoolStats,
+        key: Hashable,
+        factory: Callable[[], Any],
+        factory_lock: Optional[threading.Lock] = None,
+    ) -> Any:
+        with self._lock:
+            value = self._lookup(cache, stats, key)
+            if value is not _MISSING:
+                return value
+            if factory_lock is None:
+                factory_lock = self._key_locks.setdefault(
+                    key, threading.Lock()
+                )
+        with factory_lock:
+            # Another thread may have built it while this one waited
+            with self._lock:
+                value = self._lookup(cache, stats, key)
+                if value is not _MISSING:
+                    return value
+                stats.misses += 1
+            value = factory()
+            with self._lock:
+                cache[key] = value
+                self._key_locks.pop(key, None)
+                if len(cache) > self.maxsize:
+                    cache.popitem(last=False)
+        return value
+
+    def _session_lock(self, session: boto3.Session) -> threading.Lock:
+        with self._lock:
+            lock = self._session_locks.get(session)
+            if lock is None:
+                lock = self._session_locks[session] = threading.Lock()
+            return lock
+
+    def get_session(
+        self,
+        key: Hashable,
+        factory: Callable[[], boto3.Session],
+    ) -> boto3.Session:
+        return self._get_or_create(
+            self._sessions, self.session_stats, key, factory
+        )
+
+    def get_client(
+        self,
+        service_name: str,
+        session: Optional[boto3.Session] = None,
+        region_name: Optional[AWSRegionType] = None,
+        config: Optional[Config] = None,
+        performance_profile: Optional[PerformanceProfile] = None,
+    ) -> Any:
+        this_session = create_session(session=session, region_name=region_name)
+        region_name = region_name or this_session.region_name
+        key = (
+            get_credential_identity(this_session),
+            region_name,
+            service_name,
+            performance_profile,
+            get_config_key(config),
+        )
+        return self._get_or_create(
+            self._clients,
+            self.client_stats,
+            key,
+            lambda: this_session.client(
+                service_name=service_name,
+                region_name=region_name,
+                config=get_client_config(performance_profile, config),
+            ),
+            factory_lock=self._session_lock(this_session),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._clients.clear()
+
+
+SESSION_POOL = SessionPool()
+
+
 def create_session(
     session: Optional[boto3.Session] = None,
     region_name: Optional[AWSRegionType] = None,
     profile_name: Optional[str] = None,
     access_key_credential: Optional[AccessKeyCredential] = None,
     assume_role_config: Optional[AssumeRoleConfig] = None,
+    performance_profile: Optional[PerformanceProfile] = None,
 ) -> boto3.Session:
-    """Create and ensure a valid boto3 session."""
+    """Create and ensure a valid boto3 session.
+
+    Sessions built from an access key or a profile are cached in
+    ``SESSION_POOL``. ``performance_profile`` sets the default client config
+    of sessions created here; a session passed in or the boto3 default
+    session is returned unchanged.
+    """
 
     if access_key_credential is not None:
-        return boto3.Session(
-            aws_access_key_id=access_key_credential.aws_access_key_id,
-            aws_secret_access_key=access_key_credential.aws_secret_access_key,
-            aws_session_token=access_key_credential.aws_session_token,
-            region_name=region_name,
+        return SESSION_POOL.get_session(
+            (
+                "access-key",
+                astuple(access_key_credential),
+                region_name,
+                performance_profile,
+            ),
+            lambda: boto3.Session(
+                aws_access_key_id=access_key_credential.aws_access_key_id,
+                aws_secret_access_key=access_key_credential.aws_secret_access_key,
+                aws_session_token=access_key_credential.aws_session_token,
+                region_name=region_name,
+                botocore_session=_new_botocore_session(performance_profile),
+            ),
         )
     if assume_role_config is not None:
         return create_assume_role_session(
             assume_role_config=assume_role_config,
             region_name=region_name,
+            performance_profile=performance_profile,
         )
     if session is not None:
         return session
-    if boto3.DEFAULT_SESSION is not None:
+    if boto3.DEFAULT_SESSION is not None and profile_name is None:
         return boto3.DEFAULT_SESSION
-    return boto3.Session(region_name=region_name, profile_name=profile_name)
+    return SESSION_POOL.get_session(
+        ("profile", profile_name, region_name, performance_profile),
+        lambda: boto3.Session(
+            region_name=region_name,
+            profile_name=profile_name,
+            botocore_session=_new_botocore_session(performance_profile),
+        ),
+    )
+
+
+def get_client(
+    service_name: str,
+    session: Optional[boto3.Session] = None,
+    region_name: Optional[AWSRegionType] = None,
+    config: Optional[Config] = None,
+    performance_profile: Optional[PerformanceProfile] = None,
+) -> Any:
+    """Get a cached service client from ``SESSION_POOL``.
+
+    If no session is passed in, ``create_session`` picks one. The client
+    config is ``config`` on top of the ``performance_profile`` preset.
+    """
+
+    return SESSION_POOL.get_client(
+        service_name,
+        session=session,
+        region_name=region_name,
+        config=config,
+        performance_profile=performance_profile,
+    )
 
 
 def create_sts_client(
     session: Optional[boto3.Session] = None,
+    performance_profile: Optional[PerformanceProfile] = None,
 ) -> STSClient:
-    """Create a S3 Client.
+    """Create a STS Client.
 
     If no session is passed in, a new session is created to build the client.
     """
 
-    this_session = create_session(session=session)
-    sts_client = this_session.client(service_name="sts")
-    return sts_client
+    return get_client(
+        "sts", session=session, performance_profile=performance_profile
+    )
 
 
 def get_assume_role_response(
@@ -94,13 +364,13 @@ def get_assume_role_response(
         DurationSeconds=assume_role_config.duration_seconds,
     )
     if assume_role_config.policy_arns:
-        partial(
+        assume_role = partial(
             assume_role,
             PolicyArns=assume_role_config.policy_arns,
         )
 
     if assume_role_config.policy_json_str:
-        partial(
+        assume_role = partial(
             assume_role,
             Policy=assume_role_config.policy_json_str,
         )
@@ -109,30 +379,275 @@ def get_assume_role_response(
     return assume_role_response
 
 
+def get_assume_role_key(assume_role_config: AssumeRoleConfig) -> Hashable:
+    """Hashable identity of an AssumeRoleConfig."""
+    return (
+        assume_role_config.role_arn,
+        assume_role_config.session_name,
+        assume_role_config.duration_seconds,
+        json.dumps(assume_role_config.policy_arns, sort_keys=True),
+        assume_role_config.policy_json_str,
+    )
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class AssumeRoleCache:
+    """Share assumed role credentials per AssumeRoleConfig.
+
+    Credentials are reused until ``refresh_margin`` before they expire, and
+    concurrent callers for the same config wait for a single STS call.
+    ``clock`` returns the current timezone-aware time and can be replaced in
+    tests.
+    """
+
+    def __init__(
+        self,
+        refresh_margin: timedelta = timedelta(minutes=15),
+        clock: Callable[[], datetime] = _utc_now,
+    ):
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.stats = PoolStats()
+        self._credentials: Dict[Hashable, CredentialsTypeDef] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_credentials(
+        self,
+        assume_role_config: AssumeRoleConfig,
+        session: Optional[boto3.Session] = None,
+    ) -> CredentialsTypeDef:
+        key = get_assume_role_key(assume_role_config)
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            credentials = self._credentials.get(key)
+            if (
+                credentials is not None
+                and credentials["Expiration"] - self.refresh_margin
+                > self.clock()
+            ):
+                self.stats.hits += 1
+                return credentials
+            self.stats.misses += 1
+            credentials = get_assume_role_response(
+                assume_role_config, session=session
+            )["Credentials"]
+            self._credentials[key] = credentials
+            return credentials
+
+    def invalidate(
+        self,
+        assume_role_config: Optional[AssumeRoleConfig] = None,
+    ) -> None:
+        """Drop the credentials of one config, or of all configs."""
+        with self._lock:
+            if assume_role_config is None:
+                self._credentials.clear()
+            else:
+                key = get_assume_role_key(assume_role_config)
+                self._credentials.pop(key, None)
+
+
+ASSUME_ROLE_CACHE = AssumeRoleCache()
+
+
 def create_assume_role_session(
     assume_role_config: AssumeRoleConfig,
     session: Optional[boto3.Session] = None,
     region_name: Optional[AWSRegionType] = None,
+    assume_role_cache: Optional[AssumeRoleCache] = None,
+    performance_profile: Optional[PerformanceProfile] = None,
 ) -> boto3.Session:
-    """Create a assumed role session."""
-    assume_role_response = get_assume_role_response(
-        assume_role_config,
-        session=session,
-    )
-    credentials = assume_role_response["Credentials"]
-    access_key_credentials = AccessKeyCredential(
-        aws_access_key_id=credentials["AccessKeyId"],
-        aws_secret_access_key=credentials["SecretAccessKey"],
-        aws_session_token=credentials["SessionToken"],
-    )
-    return create_session(
-        access_key_credential=access_key_credentials, region_name=region_name
+    """Create a assumed role session.
+
+    The session holds refreshable credentials: botocore renews them from
+    ``assume_role_cache`` shortly before they expire (15 minutes ahead,
+    without blocking other threads), so the session can be used for longer
+    than ``duration_seconds``. Sessions are shared per config and region.
+    """
+    cache = assume_role_cache or ASSUME_ROLE_CACHE
+
+    def refresh() -> Dict[str, str]:
+        credentials = cache.get_credentials(
+            assume_role_config, session=session
+        )
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"].isoformat(),
+        }
+
+    # Assume the role before taking the pool lock, so STS calls for other
+    # roles are not serialized behind this one
+    credentials = cache.get_credentials(assume_role_config, session=session)
+
+    def build_session() -> boto3.Session:
+        refreshable_credentials = RefreshableCredentials(
+            access_key=credentials["AccessKeyId"],
+            secret_key=credentials["SecretAccessKey"],
+            token=credentials["SessionToken"],
+            expiry_time=credentials["Expiration"],
+            refresh_using=refresh,
+            method="sts-assume-role",
+            time_fetcher=cache.clock,
+        )
+        botocore_session = _new_botocore_session(performance_profile)
+        botocore_session._credentials = refreshable_credentials
+        return boto3.Session(
+            botocore_session=botocore_session, region_name=region_name
+        )
+
+    return SESSION_POOL.get_session(
+        (
+            "assume-role",
+            get_assume_role_key(assume_role_config),
+            region_name,
+            id(cache),
+            performance_profile,
+        ),
+        build_session,
     )
 
 
+@dataclass
+class AssumeRoleResult:
+    """Outcome of assuming one role in ``create_assume_role_sessions``."""
+
+    assume_role_config: AssumeRoleConfig
+    session: Optional[boto3.Session] = None
+    error: Optional[Exception] = None
+
+
+def create_assume_role_sessions(
+    assume_role_configs: Sequence[AssumeRoleConfig],
+    session: Optional[boto3.Session] = None,
+    region_name: Optional[AWSRegionType] = None,
+    max_workers: int = 8,
+    performance_profile: Optional[PerformanceProfile] = None,
+) -> List[AssumeRoleResult]:
+    """Assume many roles concurrently on a thread pool.
+
+    At most ``max_workers`` STS calls run at once. Results are returned in
+    the order of ``assume_role_configs``; a role that cannot be assumed gets
+    its exception in ``error`` instead of failing the whole batch.
+    """
+    # Resolve the shared base session and STS client once, up front
+    base_session = create_session(session=session)
+    create_sts_client(base_session)
+
+    def assume(assume_role_config: AssumeRoleConfig) -> boto3.Session:
+        return create_assume_role_session(
+            assume_role_config,
+            session=base_session,
+            region_name=region_name,
+            performance_profile=performance_profile,
+        )
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(assume, assume_role_config)
+            for assume_role_config in assume_role_configs
+        ]
+        for assume_role_config, future in zip(assume_role_configs, futures):
+            error = future.exception()
+            results.append(
+                AssumeRoleResult(
+                    assume_role_config=assume_role_config,
+                    session=None if error is not None else future.result(),
+                    error=error,
+                )
+            )
+    return results
+
+
+class CallerIdentityCache:
+    """Cache STS caller identities per credential identity for ``ttl``."""
+
+    def __init__(
+        self,
+        ttl: timedelta = timedelta(hours=1),
+        clock: Callable[[], datetime] = _utc_now,
+    ):
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = PoolStats()
+        self._identities: Dict[
+            Hashable, Tuple[datetime, GetCallerIdentityResponseTypeDef]
+        ] = {}
+        self._lock = threading.Lock()
+
+    def get_caller_identity(
+        self,
+        session: Optional[boto3.Session] = None,
+    ) -> GetCallerIdentityResponseTypeDef:
+        this_session = create_session(session=session)
+        key = get_credential_identity(this_session)
+        with self._lock:
+            cached = self._identities.get(key)
+            if cached is not None and cached[0] > self.clock():
+                self.stats.hits += 1
+                return cached[1]
+            self.stats.misses += 1
+        identity = create_sts_client(this_session).get_caller_identity()
+        with self._lock:
+            self._identities[key] = (self.clock() + self.ttl, identity)
+        return identity
+
+    def invalidate(self, session: Optional[boto3.Session] = None) -> None:
+        """Drop the identity of one session, or of all sessions."""
+        with self._lock:
+            if session is None:
+                self._identities.clear()
+            else:
+                key = get_credential_identity(session)
+                self._identities.pop(key, None)
+
+    def prewarm(
+        self,
+        profile_names: Sequence[str],
+        max_workers: int = 8,
+    ) -> Dict[str, Union[str, Exception]]:
+        """Look up the identities of several profiles concurrently.
+
+        Returns the account id of each profile, or the exception raised for
+        it.
+        """
+
+        def get_account(profile_name: str) -> str:
+            session = create_session(profile_name=profile_name)
+            return self.get_caller_identity(session)["Account"]
+
+        results: Dict[str, Union[str, Exception]] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                profile_name: executor.submit(get_account, profile_name)
+                for profile_name in profile_names
+            }
+            for profile_name, future in futures.items():
+                error = future.exception()
+                results[profile_name] = (
+                    error if error is not None else future.result()
+                )
+        return results
+
+
+CALLER_IDENTITY_CACHE = CallerIdentityCache()
+
+
+def get_caller_identity(
+    session: Optional[boto3.Session] = None,
+) -> GetCallerIdentityResponseTypeDef:
+    """Get the caller identity of a session, see CALLER_IDENTITY_CACHE."""
+    return CALLER_IDENTITY_CACHE.get_caller_identity(session)
+
+
 def get_account_id(
     session: Optional[boto3.Session] = None,
 ) -> str:
-    this_session = create_session(session=session)
-    client = this_session.client(service_name="sts")
-    return client.get_caller_identity()["Account"]
+    return get_caller_identity(session)["Account"]
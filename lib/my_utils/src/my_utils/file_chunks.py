@@ -0,0 +1,40 @@
+"""Split large line-oriented files into byte ranges for parallel workers."""
+
+import os
+from typing import Iterator, List, Tuple
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+def split_line_ranges(
+    file_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[Tuple[int, int]]:
+    """Split a file into ``(start, end)`` byte ranges ending on line boundaries.
+
+    Every range but the last is at least ``chunk_size`` bytes long.
+    """
+    file_size = os.path.getsize(file_path)
+    ranges = []
+    start = 0
+    with open(file_path, "rb") as f:
+        while start < file_size:
+            f.seek(min(start + chunk_size, file_size))
+            f.readline()
+            end = min(f.tell(), file_size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def iter_range_lines(file_path: str, start: int, end: int) -> Iterator[bytes]:
+    """Iterate the lines of a byte range produced by ``split_line_ranges``."""
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
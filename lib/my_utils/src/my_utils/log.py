@@ -1,8 +1,25 @@
 import atexit
-import io
+import copy
+import glob
+import gzip
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import shutil
 import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
 
 DEFAULT_LOGGER_NAME = "my_utils"
 
@@ -16,66 +33,682 @@ class LogLevel(str, Enum):
     NOTSET = "NOTSET"
 
 
+class LazyField:
+    """A log field computed only when the record is formatted.
+
+    Records below the logger level are never created, so the function is
+    not called for them. The value replaces the field on the record, so it
+    is computed once however many handlers format the record.
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], Any]):
+        self.func = func
+
+
+_LOG_RECORD_ATTRS = frozenset(
+    vars(logging.makeLogRecord({}))
+) | {"message", "asctime", "taskName"}
+
+
+# Calling Logger._log from a wrapper adds a frame that findCaller only
+# counts towards stacklevel from Python 3.11 on; before that it already
+# starts at the caller of the function that calls _log.
+_STACKLEVEL_OFFSET = 1 if sys.version_info >= (3, 11) else 0
+
+
+def _namespace_fields(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Rename fields that would overwrite a LogRecord attribute."""
+    return {
+        f"field_{key}" if key in _LOG_RECORD_ATTRS else key: value
+        for key, value in fields.items()
+    }
+
+
+def _dumps_json(data: Dict[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode("utf-8")
+    return json.dumps(data, default=str, separators=(",", ":"))
+
+
+class JsonFormatter(logging.Formatter):
+    """Format every record as one compact JSON object.
+
+    Extra fields on the record (``extra=`` or keyword arguments of a
+    ``Logger(json_format=True)``) are added as top-level keys, with
+    ``LazyField`` values evaluated here. Uses orjson when it is installed.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "func": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        for key, value in list(record.__dict__.items()):
+            if key in _LOG_RECORD_ATTRS:
+                continue
+            if isinstance(value, LazyField):
+                value = value.func()
+                setattr(record, key, value)
+            data[key] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return _dumps_json(data)
+
+
+class S3LogHandler(logging.Handler):
+    """Ship formatted records to S3 from a background thread.
+
+    Records are formatted on the calling thread and put on a bounded queue;
+    they are dropped and counted in ``dropped`` when the queue is full, so
+    logging never waits on the network. The background thread uploads the
+    buffered lines as a new part object under ``s3_prefix`` whenever
+    ``flush_bytes`` are buffered or ``flush_interval`` seconds have passed,
+    and once more on close/exit.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        s3_bucket: str,
+        s3_prefix: str,
+        max_queue_size: int = 10_000,
+        flush_bytes: int = 5 * 1024 * 1024,
+        flush_interval: float = 60.0,
+    ):
+        super().__init__()
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix.rstrip("/")
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.uploaded_parts = 0
+        self._run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self._queue: queue.Queue = queue.Queue(max_queue_size)
+        self._s3_client: Any = None
+        self._thread = threading.Thread(
+            target=self._run, name="S3LogHandler", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self._queue.put_nowait(msg)
+        except queue.Full:
+            self.dropped += 1
+
+    def _upload(self, lines: List[str]) -> None:
+        from my_utils.aws.s3 import create_s3_client, write
+
+        if self._s3_client is None:
+            self._s3_client = create_s3_client()
+        key = f"{self.s3_prefix}/{self._run_id}-{self.uploaded_parts:05d}.log"
+        try:
+            write(
+                body="".join(f"{line}\n" for line in lines).encode("utf-8"),
+                bucket=self.s3_bucket,
+                key=key,
+                s3_client=self._s3_client,
+            )
+            self.uploaded_parts += 1
+        except Exception:
+            # Logging from here would feed back into this handler
+            traceback.print_exc(file=sys.stderr)
+
+    def _run(self) -> None:
+        lines: List[str] = []
+        n_bytes = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                msg = self._queue.get(
+                    timeout=max(0.0, deadline - time.monotonic())
+                )
+            except queue.Empty:
+                msg = None
+            if msg is self._STOP:
+                break
+            if msg is not None:
+                lines.append(msg)
+                n_bytes += len(msg)
+            if lines and (
+                n_bytes >= self.flush_bytes or time.monotonic() >= deadline
+            ):
+                self._upload(lines)
+                lines = []
+                n_bytes = 0
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+        if lines:
+            self._upload(lines)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        super().close()
+
+
+LogCompression = Literal["gzip", "zstd"]
+
+_COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+class CompressedRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """File handler that rotates by size and/or time and compresses segments.
+
+    A segment is rotated once the file reaches ``max_bytes`` or every
+    ``rotate_interval`` seconds. Rotated segments are renamed to
+    ``<file>.<timestamp>-<n>`` and compressed (gzip, or zstd when the
+    ``zstandard`` package is installed) on a background thread, so the
+    logging call only pays for the rename. Only the newest ``backup_count``
+    segments are kept if it is set.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 0,
+        rotate_interval: Optional[float] = None,
+        backup_count: int = 0,
+        compression: Optional[LogCompression] = "gzip",
+        encoding: Optional[str] = None,
+    ):
+        if compression == "zstd":
+            import zstandard  # noqa: F401
+        elif compression not in (None, "gzip"):
+            raise ValueError(f"Unsupported compression: {compression}")
+        super().__init__(filename, "a", encoding=encoding)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compression = compression
+        self._segment_count = 0
+        self._rollover_at = (
+            time.time() + rotate_interval if rotate_interval else None
+        )
+        self._compressor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="CompressedRotatingFileHandler"
+        )
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self._rollover_at is not None and time.time() >= self._rollover_at:
+            return True
+        # Checked before the write, so a segment can exceed max_bytes by one
+        # record; this avoids formatting the record twice
+        return bool(self.max_bytes) and (
+            self.stream is not None and self.stream.tell() >= self.max_bytes
+        )
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None  # type: ignore[assignment]
+        self._segment_count = (self._segment_count + 1) % 10_000
+        segment = (
+            f"{self.baseFilename}.{time.strftime('%Y%m%dT%H%M%S')}"
+            f"-{self._segment_count:04d}"
+        )
+        if os.path.exists(self.baseFilename):
+            os.rename(self.baseFilename, segment)
+            self._compressor.submit(self._finish_segment, segment)
+        if self.rotate_interval:
+            self._rollover_at = time.time() + self.rotate_interval
+        self.stream = self._open()
+
+    def _finish_segment(self, segment: str) -> None:
+        try:
+            if self.compression is not None:
+                self._compress(segment)
+            if self.backup_count:
+                self._remove_old_segments()
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+
+    def _compress(self, segment: str) -> None:
+        target = segment + _COMPRESSION_SUFFIXES[self.compression]
+        with open(segment, "rb") as f_in:
+            if self.compression == "zstd":
+                import zstandard
+
+                with open(target, "wb") as f_out:
+                    zstandard.ZstdCompressor().copy_stream(f_in, f_out)
+            else:
+                with gzip.open(target, "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+        os.remove(segment)
+
+    def _remove_old_segments(self) -> None:
+        suffix = _COMPRESSION_SUFFIXES.get(self.compression, "")
+        pattern = f"{glob.escape(self.baseFilename)}.*-[0-9][0-9][0-9][0-9]"
+        segments = sorted(glob.glob(pattern + suffix))
+        for segment in segments[: -self.backup_count]:
+            os.remove(segment)
+
+    def close(self) -> None:
+        super().close()
+        self._compressor.shutdown(wait=True)
+
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a bounded queue that either blocks or drops when full.
+
+    Dropped records are counted in ``dropped``.
+    """
+
+    def __init__(self, log_queue: queue.Queue, block: bool = False):
+        super().__init__(log_queue)
+        self.block = block
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the args and render the traceback, while it is live, on
+        # the calling thread; formatting is left to the listener's handlers
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _TRACEBACK_FORMATTER.formatException(
+                    record.exc_info
+                )
+            # Other handlers of the logger still get the exc_info
+            record = copy.copy(record)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room on a full queue instead of raising queue.Full
+        self.queue.put(self._sentinel)
+
+
+class _CallSiteState:
+    __slots__ = ("count", "tokens", "last_refill", "suppressed")
+
+    def __init__(self, tokens: float, now: float):
+        self.count = 0
+        self.tokens = tokens
+        self.last_refill = now
+        self.suppressed = 0
+
+
+class SamplingFilter(logging.Filter):
+    """Sample and rate limit records per call site (file and line).
+
+    Of the records from one call site, one in ``sample_rate`` is kept, and at
+    most ``rate_limit`` records per second pass (token bucket of ``burst``).
+    Records above ``max_level`` always pass. Every ``summary_interval``
+    seconds a summary record reports how many records were suppressed.
+
+    ``Logger.add_sampling`` calls ``allow`` with the calling frame before
+    a record is created, so a suppressed call costs a frame lookup, a dict
+    lookup and a few arithmetic operations. Added to a ``logging.Logger``
+    as a filter the same check runs on the created record.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        sample_rate: int = 1,
+        rate_limit: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_level: int = logging.INFO,
+        summary_interval: float = 60.0,
+    ):
+        if sample_rate < 1:
+            raise ValueError(f"sample_rate must be at least 1: {sample_rate}")
+        super().__init__()
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.burst = float(burst or (rate_limit or 1))
+        self.max_level = max_level
+        self.summary_interval = summary_interval
+        self.suppressed = 0
+        self._sites: Dict[Tuple[str, int], _CallSiteState] = {}
+        self._lock = threading.Lock()
+        self._next_summary = time.monotonic() + summary_interval
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or hasattr(
+            record, "sampling_summary"
+        ):
+            return True
+        return self.allow((record.pathname, record.lineno))
+
+    def allow(self, site: Tuple[str, int]) -> bool:
+        """Count a call from ``site`` (file and line), whether to log it."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None:
+                state = self._sites[site] = _CallSiteState(self.burst, now)
+            state.count += 1
+            keep = (state.count - 1) % self.sample_rate == 0
+            if keep and self.rate_limit is not None:
+                state.tokens = min(
+                    self.burst,
+                    state.tokens + (now - state.last_refill) * self.rate_limit,
+                )
+                state.last_refill = now
+                keep = state.tokens >= 1
+                if keep:
+                    state.tokens -= 1
+            if not keep:
+                state.suppressed += 1
+                self.suppressed += 1
+            summary_due = now >= self._next_summary
+            if summary_due:
+                self._next_summary = now + self.summary_interval
+                suppressed_sites = {
+                    site: site_state.suppressed
+                    for site, site_state in self._sites.items()
+                    if site_state.suppressed
+                }
+                for site_state in self._sites.values():
+                    site_state.suppressed = 0
+        if summary_due and suppressed_sites:
+            self._log_summary(suppressed_sites)
+        return keep
+
+    def _log_summary(
+        self,
+        suppressed_sites: Dict[Tuple[str, int], int],
+    ) -> None:
+        top_sites = sorted(
+            suppressed_sites.items(), key=lambda item: item[1], reverse=True
+        )[:5]
+        details = ", ".join(
+            f"{os.path.basename(path)}:{lineno}={count}"
+            for (path, lineno), count in top_sites
+        )
+        record = self.logger.makeRecord(
+            self.logger.name,
+            logging.INFO,
+            __file__,
+            0,
+            "Suppressed %d records from %d call sites: %s",
+            (sum(suppressed_sites.values()), len(suppressed_sites), details),
+            None,
+            extra={
+                "sampling_summary": {
+                    f"{path}:{lineno}": count
+                    for (path, lineno), count in suppressed_sites.items()
+                }
+            },
+        )
+        self.logger.handle(record)
+
+
+_LOG_METHOD_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "exception": logging.ERROR,
+    "critical": logging.CRITICAL,
+}
+
+
 class Logger:
 
     default_log_format = "%(asctime)s | %(levelname)s | %(module)s:%(funcName)s | line: %(lineno)d | %(message)s"
     default_log_formatter = logging.Formatter(default_log_format)
+    json_log_formatter = JsonFormatter()
 
     def __init__(
         self,
         logger_name: str = DEFAULT_LOGGER_NAME,
         log_level: LogLevel = LogLevel.DEBUG,
+        use_queue: bool = False,
+        queue_size: int = 10_000,
+        block_on_full_queue: bool = False,
+        json_format: bool = False,
     ):
-        """Create a Logger object"""
+        """Create a Logger object
+
+        With ``json_format`` handlers default to ``JsonFormatter`` and the
+        log methods accept extra fields as keyword arguments, e.g.
+        ``logger.info("imported", rows=LazyField(count_rows))``. Fields named
+        like a LogRecord attribute, e.g. ``name``, are logged as
+        ``field_name``.
+
+        With ``use_queue`` records are put on a queue of ``queue_size`` and a
+        single background thread formats them and runs every handler added
+        to this Logger. When the queue is full the logging call waits if
+        ``block_on_full_queue``, otherwise the record is dropped and counted
+        in ``dropped_records``.
+        """
         self.mylogger = logging.getLogger(logger_name)
         level_attr = logging._nameToLevel[log_level.value]
         self.mylogger.setLevel(level_attr)
 
-        self.debug = self.mylogger.debug
-        self.info = self.mylogger.info
-        self.warning = self.mylogger.warning
-        self.error = self.mylogger.error
-        self.critical = self.mylogger.critical
-        self.exception = self.mylogger.exception
+        self.queue_handler: Optional[BoundedQueueHandler] = None
+        self.queue_listener: Optional[_QueueListener] = None
+        if use_queue:
+            log_queue: queue.Queue = queue.Queue(queue_size)
+            self.queue_handler = BoundedQueueHandler(
+                log_queue, block=block_on_full_queue
+            )
+            self.queue_listener = _QueueListener(
+                log_queue, respect_handler_level=True
+            )
+            self.mylogger.addHandler(self.queue_handler)
+            self.queue_listener.start()
+            atexit.register(self.stop_queue_listener)
+
+        self.log_formatter: logging.Formatter = self.default_log_formatter
+        if json_format:
+            self.log_formatter = self.json_log_formatter
+            self.debug = self._log_with_fields(logging.DEBUG)
+            self.info = self._log_with_fields(logging.INFO)
+            self.warning = self._log_with_fields(logging.WARNING)
+            self.error = self._log_with_fields(logging.ERROR)
+            self.critical = self._log_with_fields(logging.CRITICAL)
+            self.exception = self._log_with_fields(
+                logging.ERROR, default_exc_info=True
+            )
+        else:
+            self.debug = self.mylogger.debug
+            self.info = self.mylogger.info
+            self.warning = self.mylogger.warning
+            self.error = self.mylogger.error
+            self.critical = self.mylogger.critical
+            self.exception = self.mylogger.exception
+
+    def _log_with_fields(
+        self,
+        level: int,
+        default_exc_info: Any = None,
+    ) -> Callable[..., None]:
+        mylogger = self.mylogger
+
+        def log(
+            msg: object,
+            /,
+            *args: object,
+            exc_info: Any = default_exc_info,
+            stack_info: bool = False,
+            stacklevel: int = 1,
+            extra: Optional[Dict[str, Any]] = None,
+            **fields: Any,
+        ) -> None:
+            if not mylogger.isEnabledFor(level):
+                return
+            if fields:
+                if not _LOG_RECORD_ATTRS.isdisjoint(fields):
+                    fields = _namespace_fields(fields)
+                extra = {**extra, **fields} if extra else fields
+            mylogger._log(
+                level,
+                msg,
+                args,
+                exc_info=exc_info,
+                extra=extra,
+                stack_info=stack_info,
+                stacklevel=stacklevel + _STACKLEVEL_OFFSET,
+            )
+
+        return log
+
+    @property
+    def dropped_records(self) -> int:
+        if self.queue_handler is None:
+            return 0
+        return self.queue_handler.dropped
+
+    def add_handler(self, handler: logging.Handler) -> None:
+        """Add a handler, behind the queue listener if ``use_queue`` is set."""
+        if self.queue_listener is None:
+            self.mylogger.addHandler(handler)
+        else:
+            self.queue_listener.handlers = (
+                *self.queue_listener.handlers,
+                handler,
+            )
+
+    def add_sampling(
+        self,
+        sample_rate: int = 1,
+        rate_limit: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_level: LogLevel = LogLevel.INFO,
+        summary_interval: float = 60.0,
+    ) -> SamplingFilter:
+        """Sample and rate limit records per call site, see SamplingFilter.
+
+        The log methods up to ``max_level`` are wrapped so the check runs
+        before the record is created. Calls on ``mylogger`` itself are not
+        sampled.
+        """
+        sampling_filter = SamplingFilter(
+            self.mylogger,
+            sample_rate=sample_rate,
+            rate_limit=rate_limit,
+            burst=burst,
+            max_level=logging._nameToLevel[max_level.value],
+            summary_interval=summary_interval,
+        )
+        for name, level in _LOG_METHOD_LEVELS.items():
+            if level <= sampling_filter.max_level:
+                setattr(
+                    self,
+                    name,
+                    self._sampled(getattr(self, name), level, sampling_filter),
+                )
+        return sampling_filter
+
+    def _sampled(
+        self,
+        log_method: Callable[..., None],
+        level: int,
+        sampling_filter: SamplingFilter,
+    ) -> Callable[..., None]:
+        mylogger = self.mylogger
+        allow = sampling_filter.allow
+
+        def log(
+            msg: object, /, *args: Any, stacklevel: int = 1, **kwargs: Any
+        ) -> None:
+            if not mylogger.isEnabledFor(level):
+                return
+            # The frame the record would report as its call site
+            frame = sys._getframe(stacklevel)
+            if allow((frame.f_code.co_filename, frame.f_lineno)):
+                log_method(msg, *args, stacklevel=stacklevel + 1, **kwargs)
+
+        return log
+
+    def stop_queue_listener(self) -> None:
+        """Process the queued records and stop the listener thread."""
+        if self.queue_listener is not None and self.queue_listener._thread:
+            self.queue_listener.stop()
 
     def add_console_handler(
         self,
-        log_formatter: logging.Formatter = default_log_formatter,
+        log_formatter: Optional[logging.Formatter] = None,
     ) -> None:
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(log_formatter)
-        self.mylogger.addHandler(console_handler)
+        console_handler.setFormatter(log_formatter or self.log_formatter)
+        self.add_handler(console_handler)
 
     def add_file_handler(
         self,
         log_file_path: str,
-        log_formatter: logging.Formatter = default_log_formatter,
+        log_formatter: Optional[logging.Formatter] = None,
+        max_bytes: int = 0,
+        rotate_interval: Optional[float] = None,
+        backup_count: int = 0,
+        compression: Optional[LogCompression] = None,
     ) -> None:
-        file_handler = logging.FileHandler(log_file_path)
-        file_handler.setFormatter(log_formatter)
-        self.mylogger.addHandler(file_handler)
+        """Add a file handler.
+
+        Setting ``max_bytes``, ``rotate_interval`` or ``compression`` uses a
+        ``CompressedRotatingFileHandler`` instead of a plain file handler.
+        """
+        file_handler: logging.FileHandler
+        if max_bytes or rotate_interval or compression:
+            file_handler = CompressedRotatingFileHandler(
+                log_file_path,
+                max_bytes=max_bytes,
+                rotate_interval=rotate_interval,
+                backup_count=backup_count,
+                compression=compression,
+            )
+        else:
+            file_handler = logging.FileHandler(log_file_path)
+        file_handler.setFormatter(log_formatter or self.log_formatter)
+        self.add_handler(file_handler)
 
     def add_aws_s3_handler(
         self,
         s3_bucket: str,
         s3_prefix: str,
-        log_formatter: logging.Formatter = default_log_formatter,
+        log_formatter: Optional[logging.Formatter] = None,
+        max_queue_size: int = 10_000,
+        flush_bytes: int = 5 * 1024 * 1024,
+        flush_interval: float = 60.0,
     ) -> None:
-        from my_utils.aws.s3 import write
+        s3_handler = S3LogHandler(
+            s3_bucket=s3_bucket,
+            s3_prefix=s3_prefix,
+            max_queue_size=max_queue_size,
+            flush_bytes=flush_bytes,
+            flush_interval=flush_interval,
+        )
+        s3_handler.setFormatter(log_formatter or self.log_formatter)
+        self.add_handler(s3_handler)
 
-        log_stringio = io.StringIO()
-        s3_handler = logging.StreamHandler(log_stringio)
-        s3_handler.setFormatter(log_formatter)
 
-        def write_s3(body: io.StringIO) -> None:
-            write(
-                body=body.getvalue().encode("utf-8"),
-                bucket=s3_bucket,
-                key=s3_prefix,
-            )
-
-        atexit.register(
-            write_s3,
-            body=log_stringio,
-        )
-        self.mylogger.addHandler(s3_handler)
+logger = Logger()
@@ -0,0 +1,644 @@
+"""Masking of sensitive values in JSON-like records.
+
+A mask tag is a comma-separated list of dotted paths, e.g.
+``"user.name, user.contact.email"``. Each path is hashed in place, with
+sha256 by default (see ``ValueHasher``). Tags are compiled once into a
+``MaskPlan`` (a path trie) so masking a record is a single walk over the trie
+instead of re-parsing the tag.
+
+Path segments:
+
+- ``key``: a literal key, missing keys raise ValueError
+- ``key?``: a literal key that is skipped when missing
+- ``*``: every value of a dict
+- ``key[*]``: every item of the list under ``key``, e.g.
+  ``"user.contacts[*].email"``
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from hashlib import blake2b, sha256
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from my_utils.file_chunks import (
+    DEFAULT_CHUNK_SIZE,
+    iter_range_lines,
+    split_line_ranges,
+)
+
+MASK_PREFIX = "**MASKED**"
+
+
+def _hash_str(value_str: str) -> str:
+    return f"{MASK_PREFIX}{sha256(value_str.encode()).hexdigest()}"
+
+
+def hash_value(value: Any) -> str:
+    """Hash a value the same way for every masked field."""
+    return _hash_str(str(value))
+
+
+_CANONICAL_SCALARS = (str, int, float, bool, type(None))
+
+
+def _update_canonical(hasher: Any, value: Any) -> None:
+    """Feed a canonical JSON encoding of ``value`` into ``hasher``.
+
+    Dict keys are sorted, so the digest does not depend on key order, and
+    the encoding is streamed piece by piece instead of built as one string.
+    """
+    if isinstance(value, dict):
+        hasher.update(b"{")
+        for index, key in enumerate(sorted(value, key=str)):
+            if index:
+                hasher.update(b",")
+            hasher.update(json.dumps(str(key), ensure_ascii=False).encode())
+            hasher.update(b":")
+            _update_canonical(hasher, value[key])
+        hasher.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b"[")
+        for index, item in enumerate(value):
+            if index:
+                hasher.update(b",")
+            _update_canonical(hasher, item)
+        hasher.update(b"]")
+    elif isinstance(value, _CANONICAL_SCALARS):
+        hasher.update(json.dumps(value, ensure_ascii=False).encode())
+    else:
+        hasher.update(json.dumps(str(value), ensure_ascii=False).encode())
+
+
+@dataclass(frozen=True)
+class ValueHasher:
+    """How masked values are hashed.
+
+    The default matches ``hash_value``: sha256 of ``str(value)``. With
+    ``canonical`` the value is streamed into the hash as canonical JSON, so
+    dicts and lists hash the same regardless of key order and no full string
+    repr is built. ``digest_size`` (1-64 bytes) only applies to blake2b.
+    """
+
+    algorithm: Literal["sha256", "blake2b"] = "sha256"
+    digest_size: Optional[int] = None
+    canonical: bool = False
+
+    def __post_init__(self) -> None:
+        if self.algorithm not in ("sha256", "blake2b"):
+            raise ValueError(f"Unsupported hash algorithm: {self.algorithm}")
+        if self.digest_size is not None and self.algorithm != "blake2b":
+            raise ValueError("digest_size is only supported for blake2b")
+        if self.digest_size is not None and not 1 <= self.digest_size <= 64:
+            raise ValueError(
+                f"digest_size must be between 1 and 64, got {self.digest_size}"
+            )
+
+    def new(self) -> Any:
+        if self.algorithm == "blake2b":
+            return blake2b(digest_size=self.digest_size or 64)
+        return sha256()
+
+    def hash_str(self, value_str: str) -> str:
+        hasher = self.new()
+        hasher.update(value_str.encode())
+        return f"{MASK_PREFIX}{hasher.hexdigest()}"
+
+    def __call__(self, value: Any) -> str:
+        if not self.canonical:
+            return self.hash_str(str(value))
+        hasher = self.new()
+        _update_canonical(hasher, value)
+        return f"{MASK_PREFIX}{hasher.hexdigest()}"
+
+
+DEFAULT_HASHER = ValueHasher()
+
+
+class HashCache:
+    """Bounded LRU of masked values.
+
+    Repeated values are hashed once and the output is identical to the
+    uncached ``hasher``. Values are keyed on their string form; canonical
+    hashers key scalars on type and value and never cache dicts or lists.
+    Backed by ``functools.lru_cache`` so it is safe to share across threads.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100_000,
+        hasher: ValueHasher = DEFAULT_HASHER,
+    ):
+        self.maxsize = maxsize
+        self.hasher = hasher
+        if hasher.canonical:
+            self._cached = lru_cache(maxsize=maxsize, typed=True)(hasher)
+        else:
+            self._cached = lru_cache(maxsize=maxsize)(hasher.hash_str)
+
+    def hash(self, value: Any) -> str:
+        if not self.hasher.canonical:
+            return self._cached(str(value))
+        if isinstance(value, _CANONICAL_SCALARS):
+            return self._cached(value)
+        return self.hasher(value)
+
+    @property
+    def hits(self) -> int:
+        return self._cached.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self._cached.cache_info().misses
+
+    def clear(self) -> None:
+        self._cached.cache_clear()
+
+
+@dataclass
+class MaskNode:
+    """A node of the path trie; ``terminal`` marks the end of a mask path.
+
+    ``children`` are literal keys, ``any_key`` is the ``*`` wildcard over
+    dict values and ``any_item`` is the ``[*]`` wildcard over list items.
+    """
+
+    children: Dict[str, MaskNode] = field(default_factory=dict)
+    any_key: Optional[MaskNode] = None
+    any_item: Optional[MaskNode] = None
+    terminal: bool = False
+    optional: bool = True
+
+    @property
+    def has_children(self) -> bool:
+        return bool(
+            self.children
+            or self.any_key is not None
+            or self.any_item is not None
+        )
+
+
+_SEGMENT_PATTERN = re.compile(
+    r"^(?P<key>[^\[\]?]*)(?P<items>(?:\[\*\])*)(?P<optional>\?)?$"
+)
+
+
+def _add_path(root: MaskNode, path: str) -> Optional[str]:
+    """Add a path to the trie, returning its last literal key."""
+    node = root
+    last_key = None
+    for segment in path.split("."):
+        match = _SEGMENT_PATTERN.match(segment)
+        if match is None or not (match["key"] or match["items"]):
+            raise ValueError(f"Invalid segment '{segment}' in path '{path}'")
+        key = match["key"]
+        if key == "*":
+            if node.any_key is None:
+                node.any_key = MaskNode()
+            node = node.any_key
+        elif key:
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = MaskNode()
+            # A key is only optional if every path through it says so
+            child.optional = child.optional and bool(match["optional"])
+            node = child
+            last_key = key
+        for _ in range(len(match["items"]) // 3):
+            if node.any_item is None:
+                node.any_item = MaskNode()
+            node = node.any_item
+    node.terminal = True
+    return last_key
+
+
+def _merge_nodes(a: MaskNode, b: MaskNode) -> MaskNode:
+    """A node masking the paths of both ``a`` and ``b``.
+
+    The result is optional if ``a`` is, ``b`` being a wildcard.
+    """
+    merged = MaskNode(terminal=a.terminal or b.terminal, optional=a.optional)
+    for key in {**a.children, **b.children}:
+        children = [
+            node.children[key] for node in (a, b) if key in node.children
+        ]
+        merged.children[key] = (
+            _merge_nodes(*children) if len(children) == 2 else children[0]
+        )
+    for attr in ("any_key", "any_item"):
+        nodes = [
+            getattr(node, attr)
+            for node in (a, b)
+            if getattr(node, attr) is not None
+        ]
+        if nodes:
+            setattr(
+                merged,
+                attr,
+                _merge_nodes(*nodes) if len(nodes) == 2 else nodes[0],
+            )
+    return merged
+
+
+def _fold_wildcards(node: MaskNode) -> None:
+    """Merge every ``*`` into its literal siblings.
+
+    Keys with a literal child are then skipped by the wildcard, so a leaf
+    matched by both is hashed once.
+    """
+    if node.any_key is not None:
+        for key, child in node.children.items():
+            node.children[key] = _merge_nodes(child, node.any_key)
+        _fold_wildcards(node.any_key)
+    for child in node.children.values():
+        _fold_wildcards(child)
+    if node.any_item is not None:
+        _fold_wildcards(node.any_item)
+
+
+class MaskPlan:
+    """A mask tag compiled into a path trie, reusable across records.
+
+    If ``mask_json_tag`` is None the whole record is hashed.
+    """
+
+    def __init__(
+        self,
+        mask_json_tag: Optional[str] = None,
+        hasher: Optional[ValueHasher] = None,
+    ):
+        self.mask_json_tag = mask_json_tag
+        self.hasher = hasher or DEFAULT_HASHER
+        self.root: Optional[MaskNode] = None
+        # JSON-encoded last literal key of every path, used to skip records
+        # without parsing them. Empty if any path has no literal key.
+        self.leaf_tokens: Tuple[bytes, ...] = ()
+        if mask_json_tag is not None:
+            self.root = MaskNode()
+            leaf_keys = [
+                _add_path(self.root, path.strip())
+                for path in mask_json_tag.split(",")
+            ]
+            _fold_wildcards(self.root)
+            if None not in leaf_keys:
+                self.leaf_tokens = tuple(
+                    json.dumps(key, ensure_ascii=False).encode("utf-8")
+                    for key in dict.fromkeys(leaf_keys)
+                )
+
+    def apply(
+        self,
+        obj: Any,
+        hash_cache: Optional[HashCache] = None,
+        skip_missing: bool = False,
+    ) -> Any:
+        """Mask a record in place and return it.
+
+        When the plan has no paths the hash of the whole record is returned
+        instead. With ``skip_missing`` every path is treated as optional.
+        """
+        hash_func = self.hash_func(hash_cache)
+        if self.root is None:
+            return hash_func(obj)
+        _mask_node(obj, self.root, hash_func, skip_missing)
+        return obj
+
+    def hash_func(
+        self, hash_cache: Optional[HashCache] = None
+    ) -> Callable[[Any], str]:
+        if hash_cache is None:
+            return self.hasher
+        if hash_cache.hasher != self.hasher:
+            raise ValueError("hash_cache was built for a different hasher")
+        return hash_cache.hash
+
+    def may_match(self, line: bytes) -> bool:
+        """Whether a raw JSON line can contain any masked key.
+
+        Keys can be written with JSON escapes (``\\u00e9``, ``\\/``), so
+        any line with a backslash may match.
+        """
+        if not self.leaf_tokens or b"\\" in line:
+            return True
+        return any(token in line for token in self.leaf_tokens)
+
+
+def _mask_child(
+    container: Any,
+    key: Union[str, int],
+    child: MaskNode,
+    hash_func: Callable[[Any], str],
+    skip_missing: bool = False,
+) -> None:
+    # Deeper paths are masked before the node itself is hashed
+    if child.has_children:
+        _mask_node(container[key], child, hash_func, skip_missing)
+    if child.terminal:
+        container[key] = hash_func(container[key])
+
+
+def _mask_node(
+    current_object: Any,
+    node: MaskNode,
+    hash_func: Callable[[Any], str],
+    skip_missing: bool = False,
+) -> None:
+    is_dict = isinstance(current_object, dict)
+    for key, child in node.children.items():
+        if not is_dict or key not in current_object:
+            if child.optional or skip_missing:
+                continue
+            existing = (
+                current_object.keys()
+                if is_dict
+                else type(current_object).__name__
+            )
+            raise ValueError(
+                f"The key '{key}' does not exist in '{str(existing)}'"
+            )
+        _mask_child(current_object, key, child, hash_func, skip_missing)
+    if node.any_key is not None and is_dict:
+        for key in list(current_object):
+            if key not in node.children:
+                _mask_child(
+                    current_object,
+                    key,
+                    node.any_key,
+                    hash_func,
+                    skip_missing,
+                )
+    if node.any_item is not None and isinstance(current_object, list):
+        for index in range(len(current_object)):
+            _mask_child(
+                current_object, index, node.any_item, hash_func, skip_missing
+            )
+
+
+@lru_cache(maxsize=128)
+def compile_mask_plan(
+    mask_json_tag: Optional[str] = None,
+    hasher: Optional[ValueHasher] = None,
+) -> MaskPlan:
+    """Compile a mask tag, reusing the plan for tags seen before."""
+    return MaskPlan(mask_json_tag, hasher=hasher)
+
+
+def _as_plan(mask: Union[MaskPlan, str, None]) -> MaskPlan:
+    if isinstance(mask, MaskPlan):
+        return mask
+    return compile_mask_plan(mask)
+
+
+def mask_json(
+    obj: dict,
+    mask_json_tag: Optional[str] = None,
+    hash_cache: Optional[HashCache] = None,
+    hasher: Optional[ValueHasher] = None,
+) -> Any:
+    """Mask the paths of ``mask_json_tag`` in ``obj``.
+
+    Raises ValueError if a path does not exist in ``obj``.
+    """
+    plan = compile_mask_plan(mask_json_tag, hasher=hasher)
+    return plan.apply(obj, hash_cache=hash_cache)
+
+
+def mask_records(
+    records: Iterable[dict],
+    mask: Union[MaskPlan, str, None] = None,
+    hash_cache: Optional[HashCache] = None,
+) -> Iterator[Any]:
+    """Mask every record of an iterable with one compiled plan."""
+    apply = _as_plan(mask).apply
+    for record in records:
+        yield apply(record, hash_cache=hash_cache)
+
+
+def _masked_arrow_type(arrow_type: Any, node: MaskNode) -> Any:
+    """Arrow type of a column once the paths of ``node`` are masked.
+
+    Masked values become strings, every other field keeps its type.
+    """
+    import pyarrow as pa
+
+    if node.terminal:
+        return pa.string()
+    if pa.types.is_struct(arrow_type):
+        names = [arrow_field.name for arrow_field in arrow_type]
+        for key, child in node.children.items():
+            if key not in names and not child.optional:
+                raise ValueError(
+                    f"The key '{key}' does not exist in '{names}'"
+                )
+        fields = []
+        for arrow_field in arrow_type:
+            child = node.children.get(arrow_field.name, node.any_key)
+            if child is not None:
+                arrow_field = arrow_field.with_type(
+                    _masked_arrow_type(arrow_field.type, child)
+                )
+            fields.append(arrow_field)
+        return pa.struct(fields)
+    if node.any_item is not None and (
+        pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type)
+    ):
+        value_field = arrow_type.value_field.with_type(
+            _masked_arrow_type(arrow_type.value_type, node.any_item)
+        )
+        if pa.types.is_large_list(arrow_type):
+            return pa.large_list(value_field)
+        return pa.list_(value_field)
+    return arrow_type
+
+
+def mask_record_batch(
+    batch: Any,
+    mask: Union[MaskPlan, str],
+    hash_cache: Optional[HashCache] = None,
+) -> Any:
+    """Mask a ``pyarrow.RecordBatch`` or ``pyarrow.Table``.
+
+    Only the masked top-level columns are converted to Python and back.
+    Masked values become strings and every other field, nested or not,
+    keeps its type. Null values on the way to a masked path are kept.
+    """
+    import pyarrow as pa
+
+    plan = _as_plan(mask)
+    root = plan.root
+    if root is None:
+        raise ValueError("A mask tag is required to mask a record batch")
+    hash_func = plan.hash_func(hash_cache)
+    names = batch.schema.names
+    for key, child in root.children.items():
+        if key not in names and not child.optional:
+            raise ValueError(f"The key '{key}' does not exist in '{names}'")
+
+    fields = []
+    columns = []
+    for index, schema_field in enumerate(batch.schema):
+        column = batch.column(index)
+        node = root.children.get(schema_field.name, root.any_key)
+        if node is not None:
+            arrow_type = _masked_arrow_type(schema_field.type, node)
+            values = column.to_pylist()
+            for row in range(len(values)):
+                # The struct fields were checked against the schema,
+                # anything missing below here is a null
+                if values[row] is not None or node.terminal:
+                    _mask_child(
+                        values, row, node, hash_func, skip_missing=True
+                    )
+            column = pa.array(values, type=arrow_type)
+            schema_field = schema_field.with_type(arrow_type)
+        fields.append(schema_field)
+        columns.append(column)
+    schema = pa.schema(fields, metadata=batch.schema.metadata)
+    if isinstance(batch, pa.Table):
+        return pa.Table.from_arrays(columns, schema=schema)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def mask_json_lines(
+    lines: Iterable[bytes],
+    mask: Union[MaskPlan, str, None] = None,
+    skip_unmatched: bool = False,
+    hash_cache: Optional[HashCache] = None,
+) -> Iterator[bytes]:
+    """Mask JSON lines one at a time, yielding masked lines.
+
+    With ``skip_unmatched`` missing keys are skipped instead of raising
+    ValueError, and lines whose bytes cannot contain any of the masked keys
+    are passed through without being parsed.
+    """
+    plan = _as_plan(mask)
+    for line in lines:
+        if not line.strip():
+            continue
+        if skip_unmatched and not plan.may_match(line):
+            yield line if line.endswith(b"\n") else line + b"\n"
+            continue
+        masked = plan.apply(
+            json.loads(line),
+            hash_cache=hash_cache,
+            skip_missing=skip_unmatched,
+        )
+        yield json.dumps(masked, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def mask_jsonl_file(
+    input_file: BinaryIO,
+    output_file: BinaryIO,
+    mask: Union[MaskPlan, str, None] = None,
+    skip_unmatched: bool = False,
+    hash_cache: Optional[HashCache] = None,
+) -> int:
+    """Stream a JSON lines file into ``output_file`` with constant memory.
+
+    Returns the number of lines written.
+    """
+    n_lines = 0
+    for line in mask_json_lines(
+        input_file, mask, skip_unmatched=skip_unmatched, hash_cache=hash_cache
+    ):
+        output_file.write(line)
+        n_lines += 1
+    output_file.flush()
+    return n_lines
+
+
+@lru_cache(maxsize=None)
+def _worker_hash_cache(cache_size: int, hasher: ValueHasher) -> HashCache:
+    return HashCache(maxsize=cache_size, hasher=hasher)
+
+
+def _mask_file_range(
+    input_path: str,
+    start: int,
+    end: int,
+    mask_json_tag: Optional[str],
+    hasher: ValueHasher,
+    skip_unmatched: bool,
+    cache_size: Optional[int],
+) -> Tuple[int, bytes]:
+    hash_cache = (
+        None if cache_size is None else _worker_hash_cache(cache_size, hasher)
+    )
+    lines = list(
+        mask_json_lines(
+            iter_range_lines(input_path, start, end),
+            compile_mask_plan(mask_json_tag, hasher=hasher),
+            skip_unmatched=skip_unmatched,
+            hash_cache=hash_cache,
+        )
+    )
+    return len(lines), b"".join(lines)
+
+
+def mask_jsonl_file_parallel(
+    input_path: str,
+    output_path: str,
+    mask: Union[MaskPlan, str, None] = None,
+    skip_unmatched: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache_size: Optional[int] = None,
+) -> int:
+    """Mask a JSON lines file on a process pool, keeping the line order.
+
+    The file is split into byte ranges on line boundaries and each range is
+    masked by a worker. At most ``2 * workers`` chunks are in flight, so
+    memory is bounded by the chunk size rather than the file size. With
+    ``cache_size`` every worker keeps its own ``HashCache`` of that size.
+
+    Returns the number of lines written.
+    """
+    plan = _as_plan(mask)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+    ranges = split_line_ranges(input_path, chunk_size=chunk_size)
+    n_lines = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(
+        output_path, "wb"
+    ) as output_file:
+        pending: Deque[Future] = deque()
+        for start, end in ranges:
+            pending.append(
+                executor.submit(
+                    _mask_file_range,
+                    input_path,
+                    start,
+                    end,
+                    plan.mask_json_tag,
+                    plan.hasher,
+                    skip_unmatched,
+                    cache_size,
+                )
+            )
+            if len(pending) >= max_in_flight:
+                chunk_lines, data = pending.popleft().result()
+                output_file.write(data)
+                n_lines += chunk_lines
+        while pending:
+            chunk_lines, data = pending.popleft().result()
+            output_file.write(data)
+            n_lines += chunk_lines
+    return n_lines
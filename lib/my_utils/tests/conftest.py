@@ -0,0 +1,52 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+from moto import mock_aws
+
+
+@pytest.fixture
+def aws_credentials(monkeypatch):
+    """Fake credentials so moto never reaches a real account."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_SESSION_TOKEN", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+
+@pytest.fixture
+def personalize(aws_credentials):
+    """Personalize client whose responses are queued on ``.stubber``."""
+    client = boto3.client("personalize", region_name="us-east-1")
+    with Stubber(client) as stubber:
+        client.stubber = stubber
+        yield client
+        stubber.assert_no_pending_responses()
+
+
+@pytest.fixture
+def s3_client(aws_credentials):
+    """Moto S3 client with an empty ``test-bucket``."""
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="test-bucket")
+        yield client
+
+
+class FakeClock:
+    """Monotonic clock that only moves when ``sleep`` is called."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
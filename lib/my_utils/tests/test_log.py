@@ -0,0 +1,199 @@
+import json
+import logging
+import sys
+import threading
+
+import pytest
+
+from my_utils.log import JsonFormatter, LazyField, Logger, S3LogHandler
+
+
+def _record(msg):
+    return logging.makeLogRecord({"msg": msg, "levelno": logging.INFO})
+
+
+def _parts(s3_client, bucket):
+    objects = s3_client.list_objects_v2(Bucket=bucket).get("Contents", [])
+    return [
+        s3_client.get_object(Bucket=bucket, Key=o["Key"])["Body"]
+        .read()
+        .decode("utf-8")
+        for o in sorted(objects, key=lambda o: o["Key"])
+    ]
+
+
+def test_s3_log_handler_rolls_parts_and_flushes_on_close(s3_client):
+    handler = S3LogHandler("test-bucket", "app/", flush_bytes=20)
+    for i in range(5):
+        handler.emit(_record(f"message {i:03d}"))
+    handler.emit(_record("tail"))
+    handler.close()
+
+    parts = _parts(s3_client, "test-bucket")
+    # Two 11 byte lines fill a part, the last line is flushed on close
+    assert parts == [
+        "message 000\nmessage 001\n",
+        "message 002\nmessage 003\n",
+        "message 004\ntail\n",
+    ]
+    assert handler.uploaded_parts == 3
+    assert handler.dropped == 0
+
+
+def test_s3_log_handler_counts_dropped_records(s3_client):
+    handler = S3LogHandler(
+        "test-bucket", "app", max_queue_size=1, flush_bytes=1
+    )
+    uploading = threading.Event()
+    release = threading.Event()
+    upload = handler._upload
+
+    def blocked_upload(lines):
+        uploading.set()
+        release.wait()
+        upload(lines)
+
+    handler._upload = blocked_upload
+    handler.emit(_record("first"))
+    assert uploading.wait(5)
+    # The thread is busy with the first part: one record fits the queue
+    for i in range(4):
+        handler.emit(_record(f"queued {i}"))
+    release.set()
+    handler.close()
+
+    assert handler.dropped == 3
+    assert _parts(s3_client, "test-bucket") == ["first\n", "queued 0\n"]
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def json_logger(request):
+    log = Logger(f"tests.{request.node.name}", json_format=True)
+    handler = _ListHandler()
+    log.add_handler(handler)
+    yield log, handler.records
+    log.mylogger.removeHandler(handler)
+
+
+def test_json_logger_records_the_caller(json_logger):
+    log, records = json_logger
+
+    def helper():
+        log.info("from helper", stacklevel=2)
+
+    log.info("direct")
+    line = sys._getframe().f_lineno - 1
+    helper()
+    helper_line = sys._getframe().f_lineno - 1
+
+    assert [(r.funcName, r.lineno) for r in records] == [
+        ("test_json_logger_records_the_caller", line),
+        ("test_json_logger_records_the_caller", helper_line),
+    ]
+
+
+def test_json_logger_namespaces_reserved_fields(json_logger):
+    log, records = json_logger
+
+    log.info("created", name="shop", msg="x", rows=3)
+
+    record = records[0]
+    assert record.getMessage() == "created"
+    assert record.name == log.mylogger.name
+    assert (record.field_name, record.field_msg, record.rows) == (
+        "shop",
+        "x",
+        3,
+    )
+    data = json.loads(JsonFormatter().format(record))
+    assert data["field_name"] == "shop"
+
+
+@pytest.mark.parametrize("json_format", [False, True])
+def test_sampling_runs_before_the_record_is_created(
+    request, monkeypatch, json_format
+):
+    log = Logger(f"tests.{request.node.name}", json_format=json_format)
+    handler = _ListHandler()
+    log.add_handler(handler)
+    sampling = log.add_sampling(sample_rate=3, summary_interval=3600)
+    made = []
+    make_record = log.mylogger.makeRecord
+    monkeypatch.setattr(
+        log.mylogger,
+        "makeRecord",
+        lambda *args, **kwargs: made.append(1) or make_record(*args, **kwargs),
+    )
+
+    for i in range(6):
+        log.info("first %d", i)
+        first_line = sys._getframe().f_lineno - 1
+        log.debug("second %d", i)
+    log.warning("not sampled")
+
+    assert [r.getMessage() for r in handler.records] == [
+        "first 0",
+        "second 0",
+        "first 3",
+        "second 3",
+        "not sampled",
+    ]
+    assert len(made) == 5
+    assert sampling.suppressed == 8
+    assert handler.records[0].lineno == first_line
+    assert handler.records[0].funcName == request.node.originalname
+    log.mylogger.removeHandler(handler)
+
+
+@pytest.mark.parametrize("sample_rate", [0, -1])
+def test_sampling_rejects_rates_below_one(request, sample_rate):
+    log = Logger(f"tests.{request.node.name}")
+    info = log.info
+
+    with pytest.raises(ValueError, match="sample_rate must be at least 1"):
+        log.add_sampling(sample_rate=sample_rate)
+    # The log methods are left unwrapped
+    assert log.info == info
+
+
+@pytest.mark.parametrize("use_queue", [False, True])
+def test_json_exceptions_through_the_queue(request, use_queue):
+    log = Logger(
+        f"tests.{request.node.name}", use_queue=use_queue, json_format=True
+    )
+    handler = _ListHandler()
+    handler.setFormatter(JsonFormatter())
+    log.add_handler(handler)
+    try:
+        raise KeyError("missing")
+    except KeyError:
+        log.exception("failed %s", "import", rows=3)
+    log.stop_queue_listener()
+    log.mylogger.removeHandler(log.queue_handler)
+
+    data = json.loads(handler.format(handler.records[0]))
+    assert data["message"] == "failed import"
+    assert data["rows"] == 3
+    assert data["exception"].startswith("Traceback")
+    assert "KeyError: 'missing'" in data["exception"]
+
+
+def test_lazy_fields_are_computed_once(json_logger):
+    log, records = json_logger
+    calls = []
+
+    log.info("counted", rows=LazyField(lambda: calls.append(1) or 42))
+
+    formatter = JsonFormatter()
+    for _ in range(3):
+        assert json.loads(formatter.format(records[0]))["rows"] == 42
+    assert calls == [1]
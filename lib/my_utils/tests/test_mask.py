@@ -0,0 +1,186 @@
+import json
+
+import pytest
+
+from my_utils.mask import (
+    MASK_PREFIX,
+    ValueHasher,
+    mask_json,
+    mask_json_lines,
+    mask_record_batch,
+)
+
+
+def test_mask_record_batch_keeps_unmasked_types():
+    pa = pytest.importorskip("pyarrow")
+    table = pa.table(
+        {
+            "id": pa.array([1, 2], pa.int32()),
+            "email": ["a@example.com", None],
+            "ts": pa.array([1, None], pa.timestamp("ms")),
+        },
+        metadata={"source": "test"},
+    )
+
+    masked = mask_record_batch(table, "email")
+
+    assert masked.schema.field("id").type == pa.int32()
+    assert masked.schema.field("ts").type == pa.timestamp("ms")
+    assert masked.schema.field("email").type == pa.string()
+    assert masked.schema.metadata == {b"source": b"test"}
+    assert masked.column("id").equals(table.column("id"))
+    assert all(
+        value.startswith("**MASKED**")
+        for value in masked.column("email").to_pylist()
+    )
+
+    batch = mask_record_batch(table.to_batches()[0], "email")
+    assert isinstance(batch, pa.RecordBatch)
+    assert batch.schema == masked.schema
+
+
+def test_mask_record_batch_keeps_null_structs_and_child_types():
+    pa = pytest.importorskip("pyarrow")
+    user_type = pa.struct(
+        [
+            ("email", pa.string()),
+            ("age", pa.int32()),
+            ("scores", pa.list_(pa.int16())),
+        ]
+    )
+    table = pa.table(
+        {
+            "user": pa.array(
+                [{"email": "a@example.com", "age": 3, "scores": [1]}, None],
+                user_type,
+            ),
+            "empty": pa.array([None, None], user_type),
+        }
+    )
+
+    masked = mask_record_batch(table, "user.email, user.scores[*], empty.age")
+
+    assert masked.schema.field("user").type == pa.struct(
+        [
+            ("email", pa.string()),
+            ("age", pa.int32()),
+            ("scores", pa.list_(pa.string())),
+        ]
+    )
+    assert masked.schema.field("empty").type == pa.struct(
+        [
+            ("email", pa.string()),
+            ("age", pa.string()),
+            ("scores", pa.list_(pa.int16())),
+        ]
+    )
+    user, null_user = masked.column("user").to_pylist()
+    assert user["email"].startswith(MASK_PREFIX)
+    assert user["scores"][0].startswith(MASK_PREFIX)
+    assert user["age"] == 3
+    assert null_user is None
+    assert masked.column("empty").to_pylist() == [None, None]
+    with pytest.raises(ValueError, match="'phone' does not exist"):
+        mask_record_batch(table, "user.phone")
+
+
+def _mask_lines(lines, paths):
+    return list(mask_json_lines(lines, paths, skip_unmatched=True))
+
+
+def test_skip_unmatched_parses_escaped_keys():
+    lines = [
+        b'{"\\u00e9mail": "a@example.com"}\n',
+        b'{"url\\/path": "secret", "id": 1}\n',
+    ]
+
+    masked = _mask_lines(lines, "émail,url/path")
+
+    assert b"a@example.com" not in masked[0]
+    assert b"secret" not in masked[1]
+    assert json.loads(masked[1])["id"] == 1
+
+
+def test_skip_unmatched_skips_keys_found_only_as_values():
+    line = b'{"kind": "email", "id": 1}\n'
+
+    assert _mask_lines([line], "email") == [b'{"kind": "email", "id": 1}\n']
+    with pytest.raises(ValueError):
+        list(mask_json_lines([line], "email"))
+
+
+@pytest.mark.parametrize("digest_size", [0, -1, 65, 100])
+def test_value_hasher_rejects_invalid_digest_size(digest_size):
+    with pytest.raises(ValueError, match="between 1 and 64"):
+        ValueHasher("blake2b", digest_size=digest_size)
+
+
+def test_value_hasher_digest_size():
+    short = ValueHasher("blake2b", digest_size=1)("x")
+    assert len(short) == len(MASK_PREFIX) + 2
+    assert len(ValueHasher("blake2b")("x")) == len(MASK_PREFIX) + 128
+
+
+def _hash(value):
+    return mask_json({"v": value}, "v")["v"]
+
+
+def test_wildcard_paths():
+    record = {
+        "user": {"email": "a@example.com", "phone": "123"},
+        "orders": [{"card": "4111", "id": 1}, {"card": "5500", "id": 2}],
+        "tags": ["x", "y"],
+    }
+
+    masked = mask_json(record, "user.*, orders[*].card, tags[*]")
+
+    assert masked == {
+        "user": {"email": _hash("a@example.com"), "phone": _hash("123")},
+        "orders": [
+            {"card": _hash("4111"), "id": 1},
+            {"card": _hash("5500"), "id": 2},
+        ],
+        "tags": [_hash("x"), _hash("y")],
+    }
+
+
+def test_optional_segments():
+    assert mask_json({"id": 1}, "user?.email") == {"id": 1}
+    assert mask_json({"user": {}}, "user.email?") == {"user": {}}
+    with pytest.raises(ValueError, match="'email' does not exist"):
+        mask_json({"user": {}}, "user.email")
+    # A key is required if any path through it is
+    with pytest.raises(ValueError, match="'user' does not exist"):
+        mask_json({"id": 1}, "user?.email, user.phone?")
+
+
+@pytest.mark.parametrize(
+    "paths", ["user.email, user.*", "user.*, user.email", "*.email, user.*"]
+)
+def test_overlapping_paths_hash_each_leaf_once(paths):
+    masked = mask_json(
+        {"user": {"email": "a@example.com", "name": "A"}}, paths
+    )
+
+    assert masked["user"] == {
+        "email": _hash("a@example.com"),
+        "name": _hash("A"),
+    }
+
+
+def test_overlapping_nested_paths_are_merged():
+    masked = mask_json(
+        {"users": {"a": {"email": "e", "phone": "p"}, "b": {"email": "f"}}},
+        "users.*.email, users.a.phone",
+    )
+
+    assert masked["users"] == {
+        "a": {"email": _hash("e"), "phone": _hash("p")},
+        "b": {"email": _hash("f")},
+    }
+
+
+@pytest.mark.parametrize("path", ["a..b", "a[1]", "a[*", "?"])
+def test_invalid_paths(path):
+    with pytest.raises(ValueError, match="Invalid segment"):
+        mask_json({"a": 1}, path)
@@ -0,0 +1,444 @@
+import asyncio
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from my_utils.aws import personalize as personalize_module
+from my_utils.aws import s3
+from my_utils.aws.personalize import (
+    ResourceMonitor,
+    async_wait_for_resource,
+    create_sharded_batch_inference_job,
+    get_import_job_name,
+    wait_for_resource,
+)
+from my_utils.aws.personalize_provisioner import build_provisioning_steps
+
+JOB_ARN = "arn:aws:personalize:us-east-1:123456789012:dataset-import-job/job"
+PENDING_OR_ACTIVE = ("CREATE IN_PROGRESS", "ACTIVE")
+
+
+def _expect_statuses(personalize, *statuses, failure_reason=None):
+    for status in statuses:
+        job = {"datasetImportJobArn": JOB_ARN, "status": status}
+        if failure_reason is not None and status not in PENDING_OR_ACTIVE:
+            job["failureReason"] = failure_reason
+        personalize.stubber.add_response(
+            "describe_dataset_import_job",
+            {"datasetImportJob": job},
+            {"datasetImportJobArn": JOB_ARN},
+        )
+
+
+def _wait(personalize, clock, **kwargs):
+    return wait_for_resource(
+        JOB_ARN,
+        "dataset-import-job",
+        personalize=personalize,
+        jitter=0,
+        clock=clock,
+        sleep=clock.sleep,
+        **kwargs,
+    )
+
+
+def test_wait_for_resource_backs_off_until_active(personalize, clock):
+    _expect_statuses(personalize, *["CREATE IN_PROGRESS"] * 5, "ACTIVE")
+
+    result = _wait(personalize, clock, initial_interval=5, max_interval=30)
+
+    assert result.active and result.done
+    assert clock.sleeps == [5, 10, 20, 30, 30]
+
+
+@pytest.mark.parametrize(
+    "status, active, failed",
+    [
+        ("ACTIVE", True, False),
+        ("CREATE FAILED", False, True),
+        ("CREATE STOPPED", False, True),
+        ("CREATE STOPPING", False, True),
+        ("DELETE PENDING", False, True),
+    ],
+)
+def test_wait_for_resource_stops_at_terminal_states(
+    personalize, clock, status, active, failed
+):
+    _expect_statuses(
+        personalize, "CREATE IN_PROGRESS", status, failure_reason="bad rows"
+    )
+
+    result = _wait(personalize, clock)
+
+    assert (result.status, result.active, result.failed) == (
+        status,
+        active,
+        failed,
+    )
+    assert result.failure_reason == (None if active else "bad rows")
+    assert clock.sleeps == [5]
+
+
+def test_wait_for_resource_times_out(personalize, clock):
+    _expect_statuses(personalize, *["CREATE IN_PROGRESS"] * 4)
+
+    result = _wait(personalize, clock, timeout=30)
+
+    assert not result.done
+    assert result.status == "CREATE IN_PROGRESS"
+    # The last wait is cut short by the deadline
+    assert clock.sleeps == [5, 10, 15]
+    assert clock.now == 30
+
+
+def test_async_wait_for_resource(personalize, monkeypatch, clock):
+    async def fake_sleep(seconds):
+        clock.sleep(seconds)
+
+    monkeypatch.setattr(personalize_module.asyncio, "sleep", fake_sleep)
+    _expect_statuses(personalize, *["CREATE IN_PROGRESS"] * 2, "ACTIVE")
+
+    result = asyncio.run(
+        async_wait_for_resource(
+            JOB_ARN,
+            "dataset-import-job",
+            personalize=personalize,
+            jitter=0,
+            clock=clock,
+        )
+    )
+
+    assert result.active
+    assert clock.sleeps == [5, 10]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_resource_monitor_reports_describe_errors_per_resource(
+    personalize, monkeypatch, clock, use_async
+):
+    async def fake_sleep(seconds):
+        clock.sleep(seconds)
+
+    monkeypatch.setattr(personalize_module.asyncio, "sleep", fake_sleep)
+    monitor = ResourceMonitor(
+        personalize, jitter=0, clock=clock, sleep=clock.sleep
+    )
+    missing_arn = JOB_ARN + "-missing"
+    monitor.add(missing_arn, "dataset-import-job")
+    monitor.add(JOB_ARN, "dataset-import-job")
+    personalize.stubber.add_client_error(
+        "describe_dataset_import_job",
+        service_error_code="ResourceNotFoundException",
+        service_message="No such job",
+        expected_params={"datasetImportJobArn": missing_arn},
+    )
+    _expect_statuses(personalize, "CREATE IN_PROGRESS", "ACTIVE")
+
+    if use_async:
+
+        async def collect():
+            return [r async for r in monitor.async_as_completed()]
+
+        results = asyncio.run(collect())
+    else:
+        results = list(monitor.as_completed())
+
+    assert [(r.resource_arn, r.status) for r in results] == [
+        (missing_arn, "DESCRIBE FAILED"),
+        (JOB_ARN, "ACTIVE"),
+    ]
+    assert results[0].failed
+    assert "ResourceNotFoundException" in results[0].failure_reason
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_resource_monitor_survives_connection_errors(
+    personalize, monkeypatch, clock, use_async
+):
+    async def fake_sleep(seconds):
+        clock.sleep(seconds)
+
+    get_resource_status = personalize_module.get_resource_status
+
+    def flaky_get_resource_status(resource_arn, *args):
+        if resource_arn != JOB_ARN:
+            raise EndpointConnectionError(endpoint_url="https://personalize")
+        return get_resource_status(resource_arn, *args)
+
+    monkeypatch.setattr(personalize_module.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(
+        personalize_module, "get_resource_status", flaky_get_resource_status
+    )
+    monitor = ResourceMonitor(
+        personalize, jitter=0, clock=clock, sleep=clock.sleep
+    )
+    unreachable_arn = JOB_ARN + "-unreachable"
+    monitor.add(unreachable_arn, "dataset-import-job")
+    monitor.add(JOB_ARN, "dataset-import-job")
+    _expect_statuses(personalize, "CREATE IN_PROGRESS", "ACTIVE")
+
+    if use_async:
+
+        async def collect():
+            return [r async for r in monitor.async_as_completed()]
+
+        results = asyncio.run(collect())
+    else:
+        results = list(monitor.as_completed())
+
+    assert [(r.resource_arn, r.status) for r in results] == [
+        (unreachable_arn, "DESCRIBE FAILED"),
+        (JOB_ARN, "ACTIVE"),
+    ]
+    assert "Could not connect" in results[0].failure_reason
+
+
+class FakeBatchPersonalize:
+    """Personalize stand-in that runs batch jobs against moto S3.
+
+    A job is active on its ``polls_to_finish``-th describe call and then
+    writes ``<input file>.out`` to its output path, like Personalize does.
+    Submitting the job named in ``fail_jobs`` raises a ClientError.
+    """
+
+    exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def __init__(self, s3_client, polls_to_finish=2, fail_jobs=()):
+        self.s3_client = s3_client
+        self.polls_to_finish = polls_to_finish
+        self.fail_jobs = set(fail_jobs)
+        self.jobs = {}
+        self.running = 0
+        self.max_running = 0
+
+    def create_batch_inference_job(self, jobName, jobInput, jobOutput, **_):
+        if jobName in self.fail_jobs:
+            raise ClientError(
+                {"Error": {"Code": "LimitExceededException"}},
+                "CreateBatchInferenceJob",
+            )
+        arn = f"arn:aws:personalize:::batch-inference-job/{jobName}"
+        self.jobs[arn] = {
+            "input": jobInput["s3DataSource"]["path"],
+            "output": jobOutput["s3DataDestination"]["path"],
+            "polls": 0,
+        }
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        return {"batchInferenceJobArn": arn}
+
+    def describe_batch_inference_job(self, batchInferenceJobArn):
+        job = self.jobs[batchInferenceJobArn]
+        job["polls"] += 1
+        if job["polls"] < self.polls_to_finish:
+            return {"batchInferenceJob": {"status": "CREATE IN_PROGRESS"}}
+        if job["polls"] == self.polls_to_finish:
+            self.running -= 1
+            bucket, key = s3.parse_s3_uri(job["input"])
+            body = self.s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+            out_bucket, out_prefix = s3.parse_s3_uri(job["output"])
+            self.s3_client.put_object(
+                Bucket=out_bucket,
+                Key=f"{out_prefix}{key.split('/')[-1]}.out",
+                Body=body.read(),
+            )
+        return {"batchInferenceJob": {"status": "ACTIVE"}}
+
+
+def _read(s3_client, path):
+    bucket, key = s3.parse_s3_uri(path)
+    return s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+
+def test_sharded_batch_inference_end_to_end(s3_client, clock):
+    lines = [
+        json.dumps({"userId": str(i), "pad": "x" * (i % 7)}).encode() + b"\n"
+        for i in range(200)
+    ]
+    s3_client.put_object(
+        Bucket="test-bucket", Key="input/users.jsonl", Body=b"".join(lines)
+    )
+    personalize = FakeBatchPersonalize(s3_client, fail_jobs={"run-00002"})
+    monitor = ResourceMonitor(
+        personalize, jitter=0, clock=clock, sleep=clock.sleep
+    )
+
+    result = create_sharded_batch_inference_job(
+        job_name="run",
+        solution_version_arn="arn:aws:personalize:::solution/s/1",
+        s3_input_path="s3://test-bucket/input/users.jsonl",
+        s3_output_path="s3://test-bucket/output/",
+        role_arn="role",
+        max_shard_bytes=len(b"".join(lines)) // 5,
+        max_concurrent_jobs=2,
+        monitor=monitor,
+        s3_client=s3_client,
+    )
+
+    # Shard balance: six shards in order, each within a line of an even
+    # split
+    shard_bodies = [_read(s3_client, s.input_path) for s in result.shards]
+    assert b"".join(shard_bodies) == b"".join(lines)
+    assert len(shard_bodies) == 6
+    even_split = len(b"".join(lines)) / 6
+    longest_line = max(len(line) for line in lines)
+    for body in shard_bodies:
+        assert abs(len(body) - even_split) <= longest_line
+    # Concurrency cap
+    assert personalize.max_running == 2
+    # The failed submission is reported and the other shards finish
+    assert [s.succeeded for s in result.shards] == [
+        True,
+        True,
+        False,
+        True,
+        True,
+        True,
+    ]
+    assert "LimitExceededException" in result.shards[2].error
+    assert result.shards[2].job_arn is None
+    assert not result.succeeded
+    assert result.result_paths == [
+        f"s3://test-bucket/output/part-{i:05d}.jsonl.out"
+        for i in (0, 1, 3, 4, 5)
+    ]
+    assert _read(s3_client, result.result_paths[2]) == shard_bodies[3]
+
+
+def test_sharded_batch_inference_caps_only_its_own_jobs(s3_client, clock):
+    s3_client.put_object(
+        Bucket="test-bucket", Key="input/users.jsonl", Body=b"1\n" * 40
+    )
+    personalize = FakeBatchPersonalize(s3_client)
+    monitor = ResourceMonitor(
+        personalize, jitter=0, clock=clock, sleep=clock.sleep
+    )
+    # A long running job of someone else on the same monitor
+    other_arn = personalize.create_batch_inference_job(
+        jobName="other",
+        jobInput={"s3DataSource": {"path": "s3://test-bucket/input/"}},
+        jobOutput={"s3DataDestination": {"path": "s3://test-bucket/other/"}},
+    )["batchInferenceJobArn"]
+    personalize.jobs[other_arn]["polls"] = -20
+    monitor.add(other_arn, "batch-inference-job")
+
+    result = create_sharded_batch_inference_job(
+        job_name="run",
+        solution_version_arn="arn:aws:personalize:::solution/s/1",
+        s3_input_path="s3://test-bucket/input/users.jsonl",
+        s3_output_path="s3://test-bucket/output/",
+        role_arn="role",
+        max_shard_bytes=20,
+        max_concurrent_jobs=2,
+        monitor=monitor,
+        s3_client=s3_client,
+    )
+
+    assert result.succeeded and len(result.shards) == 4
+    # Two shard jobs next to the other job
+    assert personalize.max_running == 3
+
+
+def test_sharded_batch_inference_rejects_long_job_names(s3_client):
+    with pytest.raises(ValueError, match="longer than 63 characters"):
+        create_sharded_batch_inference_job(
+            job_name="r" * 58,
+            solution_version_arn="arn:aws:personalize:::solution/s/1",
+            s3_input_path="s3://test-bucket/input/users.jsonl",
+            s3_output_path="s3://test-bucket/output/",
+            role_arn="role",
+            s3_client=s3_client,
+        )
+
+
+INTERACTIONS_DATASET_ARN = (
+    "arn:aws:personalize:us-east-1:123456789012:dataset/shop/INTERACTIONS"
+)
+
+
+def _import_steps(tmp_path, personalize, s3_client, body):
+    """Provisioning steps importing ``body`` as the interactions data."""
+    s3_client.put_object(
+        Bucket="test-bucket", Key="data/interactions.csv", Body=body
+    )
+    schema_path = tmp_path / "interactions.json"
+    schema_path.write_text(
+        json.dumps(
+            {
+                "type": "record",
+                "name": "Interactions",
+                "fields": [
+                    {"name": "USER_ID", "type": "string"},
+                    {"name": "TIMESTAMP", "type": "long"},
+                ],
+            }
+        )
+    )
+    spec = {
+        "dataset_group": "shop",
+        "role_arn": "arn:aws:iam::123456789012:role/personalize",
+        "datasets": {
+            "Interactions": {
+                "schema_path": str(schema_path),
+                "data_path": "s3://test-bucket/data/interactions.csv",
+            }
+        },
+    }
+    return build_provisioning_steps(spec, personalize, s3_client)
+
+
+def test_import_step_validates_the_data(tmp_path, personalize, s3_client):
+    steps = _import_steps(
+        tmp_path, personalize, s3_client, b"USER_ID,TIMESTAMP\nu1,now\n"
+    )
+
+    run = steps["import:Interactions"].run
+    with pytest.raises(ValueError, match="TIMESTAMP"):
+        run({"dataset:Interactions": INTERACTIONS_DATASET_ARN})
+    # Nothing was submitted
+    personalize.stubber.assert_no_pending_responses()
+
+
+@pytest.mark.parametrize("modified_since", [False, True])
+def test_import_step_checks_the_data_of_an_existing_job(
+    tmp_path, personalize, s3_client, modified_since
+):
+    data_path = "s3://test-bucket/data/interactions.csv"
+    steps = _import_steps(
+        tmp_path, personalize, s3_client, b"USER_ID,TIMESTAMP\nu1,1700000000\n"
+    )
+    modified = s3_client.head_object(
+        Bucket="test-bucket", Key="data/interactions.csv"
+    )["LastModified"]
+    dataset_arn = INTERACTIONS_DATASET_ARN
+    job_arn = (
+        "arn:aws:personalize:us-east-1:123456789012:dataset-import-job/"
+        + get_import_job_name(dataset_arn, data_path)
+    )
+    personalize.stubber.add_client_error(
+        "create_dataset_import_job", "ResourceAlreadyExistsException"
+    )
+    created = modified + timedelta(minutes=-1 if modified_since else 1)
+    for _ in range(1 if modified_since else 2):
+        personalize.stubber.add_response(
+            "describe_dataset_import_job",
+            {
+                "datasetImportJob": {
+                    "datasetImportJobArn": job_arn,
+                    "status": "ACTIVE",
+                    "creationDateTime": created,
+                }
+            },
+            {"datasetImportJobArn": job_arn},
+        )
+
+    run = steps["import:Interactions"].run
+    arns = {"dataset:Interactions": dataset_arn}
+    if modified_since:
+        with pytest.raises(RuntimeError, match="upload the new data"):
+            run(arns)
+    else:
+        assert run(arns) == job_arn
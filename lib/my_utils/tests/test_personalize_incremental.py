@@ -0,0 +1,152 @@
+import io
+from array import array
+
+import pytest
+from botocore.stub import ANY
+
+from my_utils.aws.personalize_incremental import (
+    MAX_IMPORT_JOB_NAME_LENGTH,
+    RowHashManifest,
+    _RowHashTable,
+    compute_file_delta,
+    compute_import_delta,
+    create_incremental_import_job,
+    row_hash,
+)
+
+DATASET_ARN = (
+    "arn:aws:personalize:us-east-1:123456789012:dataset/shop/INTERACTIONS"
+)
+JOB_ARN = "arn:aws:personalize:us-east-1:123456789012:dataset-import-job/job"
+ROLE_ARN = "arn:aws:iam::123456789012:role/personalize"
+
+
+def test_row_hash_table_grows_and_deduplicates():
+    hashes = _RowHashTable(capacity=4)
+    values = [0] + [row_hash(str(i).encode()) for i in range(100)]
+
+    assert all(hashes.add(value) for value in values)
+    assert not any(hashes.add(value) for value in values)
+    assert len(hashes) == 101
+    assert hashes.sorted_hashes() == array("Q", sorted(values))
+
+
+def test_union_merges_sorted_hashes():
+    manifest = RowHashManifest(array("Q", [1, 5, 9]))
+
+    union = manifest.union(array("Q", [2, 3, 10]))
+
+    assert union.hashes == array("Q", [1, 2, 3, 5, 9, 10])
+    assert 10 in union and 4 not in union
+    assert RowHashManifest(array("Q", [4])).union(union.hashes).hashes == (
+        array("Q", [1, 2, 3, 4, 5, 9, 10])
+    )
+
+
+def test_deltas_skip_imported_and_repeated_rows(tmp_path):
+    rows = [f"user{i % 30},item{i % 7}\n".encode() for i in range(100)]
+    manifest = RowHashManifest(
+        array("Q", sorted({row_hash(row) for row in rows[:10]}))
+    )
+    out = io.BytesIO()
+
+    delta = compute_import_delta([b"USER_ID,ITEM_ID\n"] + rows, manifest, out)
+
+    expected = list(dict.fromkeys(rows[10:]))
+    assert out.getvalue() == b"USER_ID,ITEM_ID\n" + b"".join(expected)
+    assert delta.total_rows == 100
+    assert delta.new_hashes == array(
+        "Q", sorted(row_hash(row) for row in expected)
+    )
+
+    input_path = tmp_path / "data.csv"
+    input_path.write_bytes(b"USER_ID,ITEM_ID\n" + b"".join(rows))
+    output_path = tmp_path / "delta.csv"
+    file_delta = compute_file_delta(
+        str(input_path), str(output_path), manifest, workers=2, chunk_size=64
+    )
+    assert output_path.read_bytes() == out.getvalue()
+    assert file_delta == delta
+
+
+def _expect_import(personalize, status, failure_reason=None):
+    """Stub one import job, returning the job names it is created with."""
+    job_names = []
+    personalize.stubber.add_response(
+        "create_dataset_import_job",
+        {"datasetImportJobArn": JOB_ARN},
+        {
+            "jobName": ANY,
+            "datasetArn": DATASET_ARN,
+            "dataSource": ANY,
+            "roleArn": ROLE_ARN,
+            "importMode": "INCREMENTAL",
+        },
+    )
+    job = {"status": status}
+    if failure_reason is not None:
+        job["failureReason"] = failure_reason
+    personalize.stubber.add_response(
+        "describe_dataset_import_job",
+        {"datasetImportJob": job},
+        {"datasetImportJobArn": JOB_ARN},
+    )
+    personalize.meta.events.register(
+        "before-parameter-build.personalize.CreateDatasetImportJob",
+        lambda params, **kwargs: job_names.append(params["jobName"]),
+    )
+    return job_names
+
+
+def _put_data(s3_client, file_name):
+    s3_client.put_object(
+        Bucket="test-bucket", Key=f"data/{file_name}", Body=b"A\n1\n"
+    )
+    return f"s3://test-bucket/data/{file_name}"
+
+
+def test_incremental_import_fits_the_job_name(personalize, s3_client):
+    data_path = _put_data(s3_client, "interactions" * 6 + ".csv")
+    job_names = _expect_import(personalize, "ACTIVE")
+
+    create_incremental_import_job(
+        data_path,
+        DATASET_ARN,
+        ROLE_ARN,
+        personalize=personalize,
+        s3_client=s3_client,
+    )
+
+    assert len(job_names[0]) == MAX_IMPORT_JOB_NAME_LENGTH
+    assert job_names[0].startswith("shop_INTERACTIONS_interactions")
+    manifest = RowHashManifest.load(f"{data_path}.manifest", s3_client)
+    assert manifest.hashes == array("Q", [row_hash(b"1\n")])
+
+
+def test_failed_incremental_import_keeps_the_manifest(personalize, s3_client):
+    data_path = _put_data(s3_client, "interactions.csv")
+    _expect_import(personalize, "CREATE FAILED", failure_reason="bad rows")
+
+    with pytest.raises(RuntimeError, match="CREATE FAILED: bad rows"):
+        create_incremental_import_job(
+            data_path,
+            DATASET_ARN,
+            ROLE_ARN,
+            personalize=personalize,
+            s3_client=s3_client,
+        )
+
+    assert not RowHashManifest.load(f"{data_path}.manifest", s3_client)
+
+
+def test_incremental_import_rejects_long_dataset_names(personalize):
+    dataset_arn = DATASET_ARN.replace("shop", "s" * 50)
+
+    with pytest.raises(ValueError, match="longer than 63 characters"):
+        create_incremental_import_job(
+            "s3://test-bucket/data/interactions.csv",
+            dataset_arn,
+            ROLE_ARN,
+            personalize=personalize,
+            s3_client=object(),
+        )
@@ -0,0 +1,64 @@
+import pytest
+
+from my_utils.aws.personalize_validation import (
+    validate_import_file,
+    validate_import_lines,
+)
+
+ITEMS_SCHEMA = {
+    "type": "record",
+    "name": "Items",
+    "fields": [
+        {"name": "ITEM_ID", "type": "string"},
+        {"name": "DESCRIPTION", "type": ["null", "string"]},
+        {"name": "PRICE", "type": "float"},
+    ],
+}
+
+
+def _items(n_rows):
+    rows = ["ITEM_ID,DESCRIPTION,PRICE\n"]
+    for i in range(n_rows):
+        if i % 3 == 0:
+            rows.append(f'i{i},"line one\nline, ""two""",1.5\n')
+        else:
+            rows.append(f"i{i},plain,2\n")
+    return "".join(rows).encode().splitlines(keepends=True)
+
+
+def test_quoted_fields_may_hold_line_breaks():
+    lines = _items(4) + [b"i9,,x\n"]
+
+    report = validate_import_lines(lines, ITEMS_SCHEMA)
+
+    assert report.rows == 5
+    # Rows 0 and 3 take two lines each
+    assert [(e.line, e.column, e.message) for e in report.errors] == [
+        (8, "PRICE", "not a float")
+    ]
+
+
+def test_unterminated_quoted_field():
+    report = validate_import_lines(
+        [b"ITEM_ID,DESCRIPTION,PRICE\n", b'i1,"open,1\n'], ITEMS_SCHEMA
+    )
+
+    assert [(e.line, e.message) for e in report.errors] == [
+        (2, "unterminated quoted field")
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [8, 1 << 20])
+def test_file_ranges_split_inside_quoted_fields(tmp_path, chunk_size):
+    lines = _items(60) + [b"i9,,x\n"]
+    path = tmp_path / "items.csv"
+    path.write_bytes(b"".join(lines))
+
+    report = validate_import_file(
+        str(path), ITEMS_SCHEMA, workers=2, chunk_size=chunk_size
+    )
+
+    expected = validate_import_lines(lines, ITEMS_SCHEMA)
+    assert report.rows == expected.rows == 61
+    assert report.errors == expected.errors
+    assert report.errors[0].line == len(lines)
@@ -0,0 +1,144 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+from botocore.config import Config
+from botocore.stub import Stubber
+
+from my_utils.aws.session_handler import (
+    AssumeRoleCache,
+    AssumeRoleConfig,
+    SessionPool,
+    create_sts_client,
+)
+
+
+def test_session_pool_keys_clients_on_config_values(aws_credentials):
+    pool = SessionPool()
+    session = boto3.Session()
+
+    first = pool.get_client(
+        "s3", session=session, config=Config(connect_timeout=2, retries={})
+    )
+    equal = pool.get_client(
+        "s3", session=session, config=Config(retries={}, connect_timeout=2)
+    )
+    other = pool.get_client(
+        "s3", session=session, config=Config(connect_timeout=3)
+    )
+
+    assert first is equal
+    assert other is not first
+    assert (pool.client_stats.hits, pool.client_stats.misses) == (1, 2)
+
+
+def test_session_pool_builds_outside_the_pool_lock():
+    pool = SessionPool()
+    building = threading.Event()
+    release = threading.Event()
+
+    def slow_factory():
+        building.set()
+        release.wait(5)
+        return "slow"
+
+    thread = threading.Thread(
+        target=pool.get_session, args=("slow", slow_factory)
+    )
+    thread.start()
+    assert building.wait(5)
+    # Other keys and cached keys do not wait for the slow factory
+    assert pool.get_session("fast", lambda: "fast") == "fast"
+    assert pool.get_session("fast", lambda: "other") == "fast"
+    release.set()
+    thread.join()
+    assert pool.get_session("slow", lambda: "other") == "slow"
+    assert (pool.session_stats.hits, pool.session_stats.misses) == (2, 2)
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sts_stub(aws_credentials):
+    """A session whose pooled STS client answers from a botocore Stubber."""
+    session = boto3.Session()
+    with Stubber(create_sts_client(session)) as stubber:
+        yield session, stubber
+        stubber.assert_no_pending_responses()
+
+
+def _expect_assume_role(stubber, config, key_id, expiration):
+    stubber.add_response(
+        "assume_role",
+        {
+            "Credentials": {
+                "AccessKeyId": key_id.ljust(16, "_"),
+                "SecretAccessKey": "secret",
+                "SessionToken": "token",
+                "Expiration": expiration,
+            }
+        },
+        {
+            "RoleArn": config.role_arn,
+            "RoleSessionName": config.session_name,
+            "DurationSeconds": config.duration_seconds,
+        },
+    )
+
+
+def _access_key(cache, config, session):
+    credentials = cache.get_credentials(config, session)
+    return credentials["AccessKeyId"].rstrip("_")
+
+
+def test_assume_role_cache_reuses_and_rotates_credentials(sts_stub):
+    session, stubber = sts_stub
+    clock = _FakeClock()
+    cache = AssumeRoleCache(refresh_margin=timedelta(minutes=15), clock=clock)
+    config = AssumeRoleConfig("arn:aws:iam::123456789012:role/reader", "tests")
+    expiration = clock.now + timedelta(hours=1)
+    _expect_assume_role(stubber, config, "FIRST", expiration)
+    _expect_assume_role(
+        stubber, config, "SECOND", expiration + timedelta(hours=1)
+    )
+
+    assert _access_key(cache, config, session) == "FIRST"
+    clock.now += timedelta(minutes=44)
+    assert _access_key(cache, config, session) == "FIRST"
+    # Inside the refresh window the role is assumed again
+    clock.now += timedelta(minutes=2)
+    assert _access_key(cache, config, session) == "SECOND"
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+
+
+def test_assume_role_cache_invalidate(sts_stub):
+    session, stubber = sts_stub
+    clock = _FakeClock()
+    cache = AssumeRoleCache(clock=clock)
+    reader = AssumeRoleConfig("arn:aws:iam::123456789012:role/reader", "tests")
+    writer = AssumeRoleConfig("arn:aws:iam::123456789012:role/writer", "tests")
+    expiration = clock.now + timedelta(hours=1)
+    for config, key_id in [
+        (reader, "READER-1"),
+        (writer, "WRITER-1"),
+        (reader, "READER-2"),
+        (reader, "READER-3"),
+        (writer, "WRITER-2"),
+    ]:
+        _expect_assume_role(stubber, config, key_id, expiration)
+
+    cache.get_credentials(reader, session)
+    cache.get_credentials(writer, session)
+    cache.invalidate(reader)
+    assert _access_key(cache, reader, session) == "READER-2"
+    assert _access_key(cache, writer, session) == "WRITER-1"
+    cache.invalidate()
+    assert _access_key(cache, reader, session) == "READER-3"
+    assert _access_key(cache, writer, session) == "WRITER-2"
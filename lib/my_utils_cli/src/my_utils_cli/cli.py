@@ -2,7 +2,7 @@ import typer
 
 version = 0
 from rich import print
-from my_utils_cli import docker, prefect
+from my_utils_cli import docker, mask, prefect
 from my_utils_cli.aws_login import login
 from my_utils_cli.eks import connect_eks
 
@@ -11,6 +11,7 @@ app = typer.Typer()
 
 app.add_typer(docker.app, name="docker")
 app.add_typer(prefect.app, name="prefect")
+app.add_typer(mask.app, name="mask")
 
 LOGO = rf"""
    ___  ______  _   _ _   _ _     
@@ -0,0 +1,84 @@
+import sys
+from typing import Optional
+
+import typer
+from rich import print
+from my_utils.mask import (
+    HashCache,
+    ValueHasher,
+    compile_mask_plan,
+    mask_jsonl_file,
+    mask_jsonl_file_parallel,
+)
+
+app = typer.Typer()
+
+
+@app.command()
+def jsonl(
+    input_path: str = typer.Argument("-", help="JSON lines file, '-' for stdin"),
+    output_path: str = typer.Argument("-", help="Output file, '-' for stdout"),
+    paths: Optional[str] = typer.Option(
+        None, help="Comma-separated dotted paths to mask, whole record if omitted"
+    ),
+    skip_unmatched: bool = typer.Option(
+        False, help="Skip missing keys instead of failing on them"
+    ),
+    workers: int = typer.Option(
+        1, help="Worker processes, only used when both paths are files"
+    ),
+    cache_size: int = typer.Option(
+        0, help="Cache hashes of this many distinct values per worker"
+    ),
+    algorithm: str = typer.Option("sha256", help="sha256 or blake2b"),
+    digest_size: Optional[int] = typer.Option(
+        None, help="blake2b digest size in bytes (1-64)"
+    ),
+    canonical: bool = typer.Option(
+        False, help="Hash dicts and lists as canonical JSON"
+    ),
+) -> None:
+    """Mask a JSON lines file line by line"""
+    hasher = ValueHasher(
+        algorithm=algorithm, digest_size=digest_size, canonical=canonical
+    )
+    plan = compile_mask_plan(paths, hasher=hasher)
+    if workers > 1 and "-" not in (input_path, output_path):
+        n_lines = mask_jsonl_file_parallel(
+            input_path,
+            output_path,
+            plan,
+            skip_unmatched=skip_unmatched,
+            workers=workers,
+            cache_size=cache_size or None,
+        )
+        print(f"Masked {n_lines} lines to {output_path}")
+        return
+    input_file = sys.stdin.buffer if input_path == "-" else open(input_path, "rb")
+    output_file = (
+        sys.stdout.buffer if output_path == "-" else open(output_path, "wb")
+    )
+    hash_cache = (
+        HashCache(maxsize=cache_size, hasher=hasher) if cache_size else None
+    )
+    try:
+        n_lines = mask_jsonl_file(
+            input_file,
+            output_file,
+            plan,
+            skip_unmatched=skip_unmatched,
+            hash_cache=hash_cache,
+        )
+    finally:
+        if input_path != "-":
+            input_file.close()
+        if output_path != "-":
+            output_file.close()
+    if output_path != "-":
+        print(f"Masked {n_lines} lines to {output_path}")
+
+
+@app.callback()
+def callback() -> None:
+    """Mask sensitive fields in JSON records"""
+    pass